@@ -4,10 +4,10 @@ import time, datetime, sys, json # Standard library modules
 import tkinter as tk
 import tkinter.scrolledtext as st
 
-import requests # Import other modules
-from tabulate import tabulate # Prints data quite nicely
-
 import config # The config file
+from auctionData import ingestAH, lastUpdate # The stored AH data
+from userData import loadUserItems, saveUserItems # Loading and saving item lists
+from pricing import binSearch, priceItems # Price estimates from the AH data
 
 
 helpText = """
@@ -47,81 +47,6 @@ Before closing, make sure to click "Save"
 
 
 
-def ahSearch(item):
-    """
-    Searches the stored Auction House data for an item,
-    and returns the average of the 10 auctions
-    closest to ending. Returns an integer of
-    price, and a timestamp
-    """
-    # Open AHData file and make the data a list
-    with open("auctionHouse/AHData.json","r") as f:
-        data = json.load(f)
-    
-    # We now have a list of all the data. Now, search all entries for item
-    matchedAuctions = []
-    for auction in data:
-        if item.lower() in auction["item_name"].lower():
-            try:
-                auction["bin"] # make sure its not BIN
-                # This will raise an error if it's not BIN
-
-            except KeyError: matchedAuctions.append(auction)
-    
-    # We now have a list of all the auctions who's name matches the desired item
-    # Now, find the <num> auctions closest to ending
-
-    matchedAuctions.sort(key=lambda x: x["end"]) # First time using lambda! 
-    matchedAuctions = matchedAuctions[:config.ahNum] # Get the first <num>
-
-    # Get average of highest bids, and return it
-
-    price = 0
-    for auction in matchedAuctions:
-        price += auction["highest_bid_amount"]
-
-    return price // config.ahNum # Return the average
-    
-
-
-def binSearch(item):
-    """
-    Searches the stored BIN catagoty of the Auction 
-    House data for an item, and returns the average
-    of the 10 lowest prices. Returns an integer of
-    price, and a timestamp
-    """
-    # Open AHData file and make the data a list
-    with open("auctionHouse/AHData.json","r") as f:
-        data = json.load(f)
-    
-    # We now have a list of all the data. Now, search all entries for item
-    matchedAuctions = []
-    for auction in data:
-        if item.lower() in auction["item_name"].lower():
-            try:
-                auction["bin"] # make sure its not BIN
-                # This will raise an error if it's not BIN
-                matchedAuctions.append(auction)
-
-            except KeyError: pass
-    
-    # We now have a list of all the BIN auctions who's name matches the desired item
-    # Now, find the <num> auctions with the lowest price
-
-    matchedAuctions.sort(key=lambda x: x["starting_bid"]) # First time using lambda! 
-    matchedAuctions = matchedAuctions[:config.binNum] # Get the first <num>
-
-    # Get average of price, and return it
-
-    price = 0
-    for auction in matchedAuctions:
-        price += auction["starting_bid"]
-
-    return price // config.binNum # Return the average
-
-
-
 class MainWindow(tk.Frame):
 
     def __init__(self,master=None):
@@ -131,6 +56,7 @@ class MainWindow(tk.Frame):
         self.initWindow() # Create Widgets
         self.grid()
         self.master.itemList = []
+        self.master.newUsername = None # A user that isn't saved yet, they're saved once they add an item (or click save)
 
     def initWindow(self): # Create the wiggets
 
@@ -208,11 +134,11 @@ class MainWindow(tk.Frame):
         sortBy = conversionDict[self.sortByStrVar.get()] # Just for readability of options
 
 
-        with open("auctionHouse/AHLastUpdate.txt","r") as f:
-            data = f"Last AH Data Update: {f.read()}\n"
+        data = f"Last AH Data Update: {lastUpdate()}\n" # Only actually reads the file when it changes
 
         #try:
         newList = sorted(self.master.itemList, key=lambda k: k[sortBy]) 
+        from tabulate import tabulate # Prints data quite nicely. Imported here so the window opens faster
         data += tabulate(newList,headers="keys")
         self.outputArea.configure(state ='normal')
         self.outputArea.delete("1.0",tk.END)
@@ -239,11 +165,12 @@ class MainWindow(tk.Frame):
     def updateAHPrices(self):
         if config.ahSearch:
             output = ""
+            prices = priceItems([item["Name"] for item in self.master.itemList]) # Price everything in one go
             for item in self.master.itemList:
                 output += "\n\n"
                 if str(item["AHUpdateTime"]) != "-1": # Make sure the user wants it to be checked
                                                      # Better safe than sorry with the Str stuff
-                    newCost = ahSearch(item["Name"])
+                    newCost = prices[item["Name"]][0]
                     output += f"Got new cost for {item['Name']} of {newCost}\n"
                     output += f"Old cost was {item['AHCost']}\n"
                     if item["AHCost"] - newCost > 0: # Positive = price went down
@@ -267,11 +194,12 @@ class MainWindow(tk.Frame):
     def updateBINPrices(self):
         if config.ahSearch:
             output = ""
+            prices = priceItems([item["Name"] for item in self.master.itemList]) # Price everything in one go
             for item in self.master.itemList:
                 output += "\n\n"
                 if str(item["BINUpdateTime"]) != "-1": # Make sure the user wants it to be checked
                                                         # Better safe than sorry with the Str stuff
-                    newCost = binSearch(item["Name"])
+                    newCost = prices[item["Name"]][1]
                     output += f"Got new BIN cost for {item['Name']} of {newCost}\n"
                     output += f"Old cost was {item['BINCost']}\n"
                     if item["BINCost"] - newCost > 0: # Positive = price went down
@@ -292,48 +220,17 @@ class MainWindow(tk.Frame):
 
 
     def updateAH(self):
-        """Update the AH data stored in AHData.json"""
+        """Update the stored AH data"""
         self.messageStrVar.set("Updating Auction House (this may take a while)")
-        data = [] # The list of individual auction items
-        currentPage = 0 # The page to get
-        while True:
-            # get all pages of ah data
-
-            pageData = requests.get(f"https://api.hypixel.net/skyblock/auctions?key={config.APIKey}&page={currentPage}").text 
-            # API Key might not be needed for this!
-
-            # Sure, I could use requests.get().json() but im not.
-
-            dec = json.JSONDecoder() #Create a json decoder
-            pageData = dec.decode(pageData) # make data a workable python object list
-
-            maxPage = pageData["totalPages"]
+        ingestAH() # Pages are written to disk as they come in
 
-            data.extend(pageData["auctions"]) # we don't care about the other stuff
-
-            if currentPage == maxPage:
-                break
-
-            
-            # time.sleep(0.6) # We don't wan't to go over the throttle limit, so just in case
-                            # Let's also make it a bit larger than it needs to be, again, just in case
-                            # though really, this is so slow, I doubt it matters.
-            # Commented out because you don't actually need to supply a valid
-            # api key, therefore you don't need to be worried about getting it banned.
-
-            currentPage += 1 # get a new page next time
-        
-        with open("auctionHouse/AHData.json","w") as f: # Overwrite old data
-            json.dump(data, f) # Dump all of the data, as json again, into a file
-        with open("auctionHouse/AHLastUpdate.txt","w") as f:
-            f.write(time.asctime())
 
         self.messageStrVar.set("Stored auction house data sucessfully")
         self.updateList()
 
     def saveUserData(self):
-        with open(f"userSaves/items{self.usernameStrVar.get()}.json","w") as f:
-                json.dump(self.master.itemList, f)
+        saveUserItems(self.usernameStrVar.get(), self.master.itemList)
+        self.master.newUsername = None
         self.messageStrVar.set("Saved data successfuly!")
 
     def loadUserData(self):
@@ -342,19 +239,17 @@ class MainWindow(tk.Frame):
         if self.usernameStrVar.get() == "":
             self.messageStrVar.set("No username specified. Please enter a username.")
         else:
-            try:
-                with open(f"userSaves/items{self.usernameStrVar.get()}.json","r") as f:
-                    itemList = json.load(f)
-                    self.messageStrVar.set(f"Loaded itemlist for ID: {self.usernameStrVar.get()}")
-            
+            itemList = loadUserItems(self.usernameStrVar.get())
+            if itemList is not None:
+                self.messageStrVar.set(f"Loaded itemlist for ID: {self.usernameStrVar.get()}")
+                self.master.newUsername = None
 
-            except FileNotFoundError:
+            else:
                 self.messageStrVar.set("User not found. Created new.")
-                # Create a new user ID
+                # Create a new user ID. It isn't saved until something is added,
+                # so a mistyped username doesn't leave an empty save behind
                 itemList = [] 
-
-                with open(f"userSaves/items{self.usernameStrVar.get()}.json","w") as f: # Create a new items file for this user.
-                    json.dump([],f) # Just in case the user doesn't save, they don't need to create a new ID again 
+                self.master.newUsername = self.usernameStrVar.get()
 
             
             try: 
@@ -539,6 +434,9 @@ class AddItemWindow(tk.Toplevel):
                 "BINCost":BINPrice,
                 "BINUpdateTime":BINUpdateTime
                 })
+        if self.master.newUsername is not None: # Their first item, so the user is real now
+            saveUserItems(self.master.newUsername, self.master.itemList) # Just in case the user doesn't save, they don't need to create a new ID again
+            self.master.newUsername = None
         self.master.updateList()
         self.destroy() # close the window
         
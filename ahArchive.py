@@ -0,0 +1,147 @@
+#! python3
+
+# Keeps every AH snapshot, instead of overwriting the last one, when
+# config.archiveSnapshots is on.
+
+# Most auctions are the same from one update to the next, so each different
+# version of an auction (by uuid and a hash of its json) is stored once,
+# compressed, in auctionHouse/archive/records.db. Each snapshot is then just
+# a manifest: a gzipped list of which auction versions it had, in order.
+
+# Manifest layout (auctionHouse/archive/<name>.manifest.gz, text):
+#   {"lastUpdated": ..., "archived": ...}   one line of json
+#   <uuid> <hash>                           one line per auction
+# The lines are written as the auctions come in, so how many there are goes in
+# <name>.info.json next to it ({"lastUpdated": ..., "archived": ..., "auctions": ...}).
+
+import os, gzip, json, time, zlib, hashlib, threading # Standard library modules
+
+
+ARCHIVE_DIR = os.path.join("auctionHouse", "archive")
+RECORDS_PATH = os.path.join(ARCHIVE_DIR, "records.db")
+MANIFEST_SUFFIX = ".manifest.gz"
+INFO_SUFFIX = ".info.json"
+
+BATCH_SIZE = 1000 # Records written to the database at a time
+
+_local = threading.local() # sqlite connections can't be shared between threads
+
+
+def _connect():
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        import sqlite3 # Only imported if the archive is actually used
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        connection = _local.connection = sqlite3.connect(RECORDS_PATH)
+        connection.execute("""CREATE TABLE IF NOT EXISTS records (
+            uuid TEXT NOT NULL,
+            hash TEXT NOT NULL, -- Of the auction's json, so changed auctions get a new record
+            data BLOB NOT NULL, -- The auction's json, zlib compressed
+            PRIMARY KEY (uuid, hash)
+        ) WITHOUT ROWID""")
+    return connection
+
+
+def _manifestPath(name):
+    return os.path.join(ARCHIVE_DIR, name + MANIFEST_SUFFIX)
+
+
+def _infoPath(name):
+    return os.path.join(ARCHIVE_DIR, name + INFO_SUFFIX)
+
+
+def archiveSnapshot(lines, lastUpdated=None):
+    """
+    Archives a snapshot. lines is an iterable of the auctions as json
+    (bytes, one auction each, like the lines of AHData.ndjson).
+
+    Returns the snapshot's name, which is when it was archived
+    (and its lastUpdated, if known), or None if that lastUpdated is already archived.
+    """
+    name = time.strftime("%Y%m%d-%H%M%S") + (f"-{lastUpdated}" if lastUpdated is not None else "")
+    if lastUpdated is not None and any(old.endswith(f"-{lastUpdated}") for old in listSnapshots()):
+        return None # Same data as a snapshot we already have
+
+    connection = _connect()
+    tempPath = _manifestPath(name) + ".tmp"
+    info = {"lastUpdated": lastUpdated, "archived": time.asctime()}
+    count = 0
+    try:
+        with connection, gzip.open(tempPath, "wt", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(info) + "\n")
+            batch = []
+            for line in lines:
+                line = line.strip()
+                if not line: continue
+                uuid = _uuid(line)
+                digest = hashlib.blake2b(line, digest_size=16).hexdigest()
+                manifest.write(f"{uuid} {digest}\n")
+                batch.append((uuid, digest, line))
+                count += 1
+                if len(batch) >= BATCH_SIZE:
+                    _storeRecords(connection, batch)
+                    batch = []
+            _storeRecords(connection, batch)
+        with open(_infoPath(name), "w") as f: # Before the manifest, so every snapshot has one
+            json.dump(dict(info, auctions=count), f)
+        os.replace(tempPath, _manifestPath(name))
+    finally:
+        if os.path.exists(tempPath): os.remove(tempPath)
+    return name
+
+
+def _uuid(line):
+    """Gets an auction's uuid out of its json without decoding all of it (the lore is long)"""
+    start = line.find(b'"uuid": "')
+    if start == -1: return json.loads(line).get("uuid", "")
+    start += len(b'"uuid": "')
+    return line[start:line.index(b'"', start)].decode("ascii")
+
+
+def _storeRecords(connection, batch):
+    """Stores the records in batch that aren't stored yet, only compressing the new ones"""
+    newRecords = [(uuid, digest, zlib.compress(line)) for uuid, digest, line in batch
+                  if connection.execute("SELECT 1 FROM records WHERE uuid = ? AND hash = ?", (uuid, digest)).fetchone() is None]
+    connection.executemany("INSERT OR IGNORE INTO records VALUES (?, ?, ?)", newRecords)
+
+
+def listSnapshots():
+    """Returns the names of every archived snapshot, oldest first"""
+    if not os.path.isdir(ARCHIVE_DIR): return []
+    return sorted(fileName[:-len(MANIFEST_SUFFIX)] for fileName in os.listdir(ARCHIVE_DIR) if fileName.endswith(MANIFEST_SUFFIX))
+
+
+def snapshotInfo(name):
+    """Returns a snapshot's lastUpdated, when it was archived, and how many auctions it has"""
+    try:
+        with open(_infoPath(name), "r") as f:
+            return json.load(f)
+    except FileNotFoundError: # Archived before the info files, the first line of the manifest has it all
+        with gzip.open(_manifestPath(name), "rt", encoding="utf-8") as manifest:
+            return json.loads(manifest.readline())
+
+
+def iterSnapshotLines(name):
+    """Yields the json of every auction in an archived snapshot, in the original order"""
+    connection = _connect()
+    with gzip.open(_manifestPath(name), "rt", encoding="utf-8") as manifest:
+        manifest.readline() # The info line
+        for entry in manifest:
+            uuid, digest = entry.split()
+            row = connection.execute("SELECT data FROM records WHERE uuid = ? AND hash = ?", (uuid, digest)).fetchone()
+            if row is None: raise RuntimeError(f"The archive is missing auction {uuid} of snapshot {name}")
+            yield zlib.decompress(row[0])
+
+
+def iterSnapshot(name):
+    """Yields every auction in an archived snapshot, decoded"""
+    for line in iterSnapshotLines(name):
+        yield json.loads(line)
+
+
+def restoreSnapshot(name, path):
+    """Writes an archived snapshot out as ndjson (like AHData.ndjson) to path"""
+    with open(path, "wb") as f:
+        for line in iterSnapshotLines(name):
+            f.write(line)
+            f.write(b"\n")
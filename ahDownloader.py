@@ -0,0 +1,150 @@
+#! python3
+
+# Downloads the skyblock auction house from the hypixel API.
+# Used to be a while loop copy pasted into every version of the program,
+# now they all just call downloadAH()
+
+import json, hashlib # Standard library modules
+from collections import deque
+
+import config # The config file
+
+
+def makeSession(workers=None):
+    """
+    Creates a requests session that keeps connections alive
+    between pages, so we only do the TCP + TLS handshake once
+    per worker instead of once per page.
+    """
+    import requests # Only imported when actually downloading, it's slow to import
+    from requests.adapters import HTTPAdapter
+
+    if workers is None: workers = config.downloadWorkers
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"}) # Pages are huge, but compress really well
+    return session
+
+
+def pageHash(content):
+    """
+    A hash of a page's auctions, to tell if the page changed since last time
+    without decoding it. Only the part from "auctions" on counts, the stuff before
+    it (like lastUpdated) is different every time even if no auction changed.
+    """
+    start = content.find(b'"auctions"')
+    return hashlib.sha256(content[max(start, 0):]).hexdigest()
+
+
+def decodePage(content, fields=None, dropFinished=None):
+    """
+    Decodes a page of the auction house (the bytes or text the API sent),
+    keeping only <fields> (config.auctionFields if not given) of each auction,
+    so the lore and item bytes of every auction are let go of straight away.
+    Fields an auction doesn't have (like "bin") are left out.
+
+    If dropFinished (config.dropFinishedAuctions if not given) is on, claimed
+    auctions, and auctions that ended before the page's lastUpdated, are left out too.
+    """
+    if fields is None: fields = config.auctionFields
+    if dropFinished is None: dropFinished = config.dropFinishedAuctions
+    pageData = json.loads(content) # Also turns down anything json.loads() would, like trailing commas
+    if not isinstance(pageData, dict): raise ValueError("The page isn't a json object")
+
+    auctions = pageData.get("auctions")
+    if auctions is None: return pageData # An error page, getPage() checks "success"
+    if not isinstance(auctions, list): raise ValueError("The page's auctions aren't a list")
+    lastUpdated = pageData.get("lastUpdated")
+    kept = []
+    for auction in auctions:
+        if not isinstance(auction, dict): raise ValueError(f"An auction isn't a json object: {auction!r}")
+        if dropFinished and (auction.get("claimed") or
+                             (lastUpdated is not None and auction.get("end", lastUpdated + 1) <= lastUpdated)):
+            continue
+        kept.append({field: auction[field] for field in fields if field in auction})
+    pageData["auctions"] = kept
+    return pageData
+
+
+def getPage(session, page, knownHash=None):
+    """
+    Gets a single page of the auction house, returns the decoded json
+    (only the fields we keep, see decodePage()), plus "hash" (see pageHash()).
+
+    If the page's hash is knownHash, it's the same as last time, so it isn't
+    decoded, and {"page": page, "hash": knownHash, "unchanged": True} is returned instead.
+    """
+    response = session.get(config.auctionsURL, params={"key": config.APIKey, "page": page})
+    # API Key might not be needed for this!
+    response.raise_for_status()
+
+    content = response.content
+    digest = pageHash(content)
+    if digest == knownHash: return {"page": page, "hash": digest, "unchanged": True}
+
+    del response
+    pageData = decodePage(content)
+    if not pageData.get("success", True):
+        raise RuntimeError(f"API Error on page {page}: {pageData.get('cause')}")
+    pageData["hash"] = digest
+    return pageData
+
+
+def iterPages(workers=None, session=None, knownHashes=()):
+    """
+    Yields (pageNumber, totalPages, pageData) for every page of the
+    auction house, in page order.
+
+    Page 0 is downloaded first to find out how many pages there are,
+    then the rest are downloaded <workers> at a time.
+
+    knownHashes is the hash of each page from last time (see getPage()).
+    Pages that haven't changed are yielded as {"page", "hash", "unchanged": True},
+    without their auctions. Page 0 is always decoded, since we need totalPages
+    and lastUpdated from it, but still gets "unchanged" set if it's the same.
+    """
+    from concurrent.futures import ThreadPoolExecutor # Slow to import, and only needed here
+
+    if workers is None: workers = config.downloadWorkers
+    workers = max(workers, 1)
+    ownSession = session is None
+    if ownSession: session = makeSession(workers)
+
+    try:
+        knownHashes = list(knownHashes)
+        knownHash = lambda page: knownHashes[page] if page < len(knownHashes) else None
+        firstPage = getPage(session, 0)
+        firstPage["unchanged"] = firstPage["hash"] == knownHash(0)
+        totalPages = firstPage["totalPages"]
+        yield 0, totalPages, firstPage
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Only keep <workers> pages in flight at once, so pages don't pile up
+            # in memory if whoever is reading them is slower than the network
+            pending = deque()
+            nextPage = 1
+            while nextPage < totalPages or pending:
+                while nextPage < totalPages and len(pending) < workers:
+                    pending.append(pool.submit(getPage, session, nextPage, knownHash(nextPage)))
+                    nextPage += 1
+                pageNumber = nextPage - len(pending)
+                yield pageNumber, totalPages, pending.popleft().result() # Oldest first, so pages stay in order
+    finally:
+        if ownSession: session.close()
+
+
+def downloadAH(progress=None, workers=None):
+    """
+    Downloads every page of the auction house and returns
+    a list of all the auctions, in the same order the API gives them.
+
+    progress, if given, is called with (pagesDone, totalPages)
+    after each page.
+    """
+    data = [] # The list of individual auction items
+    for pageNumber, totalPages, pageData in iterPages(workers):
+        data.extend(pageData["auctions"]) # we don't care about the other stuff
+        if progress is not None: progress(pageNumber + 1, totalPages)
+    return data
@@ -0,0 +1,391 @@
+#! python3
+
+# Everything to do with the stored auction house data.
+# The AH data is stored as one auction per line (newline delimited json)
+# so it can be written a page at a time, instead of holding the whole
+# auction house in a list first.
+
+import os, time, json, threading, itertools # Standard library modules
+
+
+import config # The config file
+from ahDownloader import iterPages # Gets all the AH pages
+from nameSearch import NameIndex # Fast item name searching
+from snapshotFile import ColumnBuilder, SnapshotFile # The binary snapshot file
+from topKIndex import TopKBuilder, loadTopK # The best auctions of each name, for quick searches
+import sqliteStore # The SQLite version of the AH data
+import ahArchive # Keeps old snapshots, if turned on
+import priceHistory # Every item's price over time
+import profiler # Timing for --profile
+
+
+AH_DIR = "auctionHouse"
+DATA_PATH = os.path.join(AH_DIR, "AHData.ndjson")
+SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX = "AHData.", ".bin" # Snapshot files are AHData.<number>.bin, see snapshotPath()
+LAST_UPDATE_PATH = os.path.join(AH_DIR, "AHLastUpdate.txt")
+META_PATH = os.path.join(AH_DIR, "AHMeta.json") # See loadMeta()
+TOPK_PATH = os.path.join(AH_DIR, "AHTopK.json") # See topKIndex.py
+
+
+def ingestAH(progress=None, workers=None):
+    """
+    Downloads the auction house and stores it with storePages().
+    Pages that haven't changed since last time aren't decoded (see loadMeta()).
+    Then adds every item's new price to the price history, if turned on.
+
+    progress, if given, is called with (pagesDone, totalPages)
+    after each page. Returns the number of auctions stored.
+    """
+    meta = loadMeta()
+    knownHashes = [page["hash"] for page in meta["pages"]] if meta is not None else ()
+    count = storePages(iterPages(workers, knownHashes=knownHashes), progress)
+
+    if config.recordPriceHistory:
+        meta = loadMeta()
+        lastUpdated = meta["lastUpdated"] if meta is not None else None # In milliseconds
+        with profiler.span("record price history"):
+            priceHistory.recordPrices(lastUpdated / 1000 if lastUpdated is not None else None)
+    return count
+
+
+def loadMeta():
+    """
+    Returns what we know about the stored AH data from META_PATH:
+        lastUpdated   the API's lastUpdated for it
+        auctions      how many auctions there are
+        pages         for each page, its hash (see ahDownloader.pageHash()) and
+                      where its auctions are in the data and snapshot files
+                      ("bytes" and "rows", both [start, length])
+        fields        which fields of each auction were kept (config.auctionFields)
+    Returns None if there's no metadata, or it doesn't match the files
+    (or config.auctionFields) anymore.
+    """
+    try:
+        with open(META_PATH, "r") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError): return None
+    if meta.get("backend") != config.storageBackend: return None
+    if meta.get("fields") != config.auctionFields: return None # Everything needs downloading again with the new fields
+    if config.storageBackend == "file":
+        try:
+            currentSnapshot = snapshotPath()
+            if (currentSnapshot is None or os.path.basename(currentSnapshot) != meta.get("snapshot")
+                    or os.path.getsize(DATA_PATH) != meta["dataBytes"] or os.path.getsize(currentSnapshot) != meta["snapshotBytes"]):
+                return None # Something else wrote the files since
+        except FileNotFoundError: return None
+    return meta
+
+
+def _writeMeta(meta):
+    tempPath = META_PATH + ".tmp"
+    with open(tempPath, "w") as f:
+        json.dump(meta, f)
+    os.replace(tempPath, META_PATH)
+
+
+@profiler.profiled("store pages")
+def storePages(pages, progress=None):
+    """
+    Writes pages (an iterable of (pageNumber, totalPages, pageData), like
+    iterPages() gives) to DATA_PATH one page at a time, so only about one
+    page is ever in memory, then writes the binary snapshot file used for searching.
+
+    The new data is written next to the old data and swapped in
+    at the end, so a failed download doesn't wipe out the old data,
+    and searches keep using the old data until then. It's safe to
+    run this in another thread.
+
+    If page 0's lastUpdated is the same as the stored data's, nothing changed,
+    so the rest of the pages aren't even downloaded. Pages marked "unchanged"
+    are copied from the old files instead of being written out again.
+
+    If config.storageBackend is "sqlite" the auctions go into the
+    database instead (see sqliteStore.py).
+
+    progress, if given, is called with (pagesDone, totalPages)
+    after each page. Returns the number of auctions stored.
+    """
+    os.makedirs(AH_DIR, exist_ok=True)
+    meta = loadMeta()
+    pages = iter(pages)
+    firstPage = next(pages, None)
+    lastUpdated = firstPage[2].get("lastUpdated") if firstPage is not None else None
+    if meta is not None and lastUpdated is not None and lastUpdated == meta["lastUpdated"]:
+        if hasattr(pages, "close"): pages.close() # Don't download the rest
+        if progress is not None: progress(firstPage[1], firstPage[1])
+        return meta["auctions"]
+    if firstPage is not None: pages = itertools.chain([firstPage], pages)
+
+    if config.storageBackend == "sqlite":
+        count = sqliteStore.storeAuctions(_pageAuctions(pages, progress))
+        with open(LAST_UPDATE_PATH, "w") as f:
+            f.write(time.asctime())
+        _writeMeta({"backend": "sqlite", "lastUpdated": lastUpdated, "auctions": count, "pages": [],
+                    "fields": config.auctionFields})
+        return count
+
+    tempPath = DATA_PATH + ".tmp"
+    columns = ColumnBuilder() # Only a few numbers per auction, so this can stay in memory
+    topK = TopKBuilder(config.ahNum, config.binNum)
+    pageMeta = []
+    oldData = oldFile = None
+    if meta is not None: # For copying unchanged pages from
+        oldData = open(DATA_PATH, "rb")
+        oldFile = SnapshotFile(snapshotPath())
+    try:
+        with open(tempPath, "wb") as f:
+            for pageNumber, totalPages, pageData in pages:
+                startRow, startByte = len(columns), f.tell()
+                if pageData.get("unchanged") and oldFile is not None and pageNumber < len(meta["pages"]):
+                    _copyPage(meta["pages"][pageNumber], oldData, oldFile, f, columns, lastUpdated)
+                elif "auctions" not in pageData:
+                    raise RuntimeError(f"Page {pageNumber} wasn't downloaded, and there's no old copy of it")
+                else:
+                    for auction in pageData["auctions"]:
+                        f.write((json.dumps(auction) + "\n").encode("utf-8"))
+                        columns.add(auction)
+                topK.addRows(columns, startRow, len(columns))
+                pageMeta.append({"hash": pageData.get("hash"), "rows": [startRow, len(columns) - startRow],
+                                 "bytes": [startByte, f.tell() - startByte]})
+                del pageData # Let go of the page before waiting on the next one
+                if progress is not None: progress(pageNumber + 1, totalPages)
+        # Windows won't replace a file that's still open, so let go of the old ones first
+        if oldData is not None: oldData.close()
+        oldFile = None
+        with _snapshotLock: # Swap everything in at once, so getSnapshot() never sees half of it
+            os.replace(tempPath, DATA_PATH) # Overwrite old data
+            newSnapshot = _newSnapshotPath()
+            columns.write(newSnapshot)
+            topK.write(TOPK_PATH, newSnapshot, len(columns.names))
+            with open(LAST_UPDATE_PATH, "w") as f:
+                f.write(time.asctime())
+            _writeMeta({"backend": "file", "lastUpdated": lastUpdated, "auctions": len(columns), "pages": pageMeta,
+                        "dataBytes": os.path.getsize(DATA_PATH), "snapshot": os.path.basename(newSnapshot),
+                        "snapshotBytes": os.path.getsize(newSnapshot), "fields": config.auctionFields})
+        _removeOldSnapshots()
+    finally:
+        if oldData is not None: oldData.close()
+        if os.path.exists(tempPath): os.remove(tempPath)
+
+    if config.archiveSnapshots:
+        with profiler.span("archive snapshot"), open(DATA_PATH, "rb") as f:
+            ahArchive.archiveSnapshot(f, lastUpdated)
+    return len(columns)
+
+
+def _copyPage(oldPage, oldData, oldFile, f, columns, lastUpdated):
+    """
+    Copies an unchanged page's auctions from the old data and snapshot files
+    (oldPage is its entry in the old meta) onto the end of f and columns.
+    If config.dropFinishedAuctions is on, auctions that have ended since it
+    was stored are left out, same as if the page had been downloaded.
+    """
+    start, count = oldPage["rows"]
+    oldData.seek(oldPage["bytes"][0])
+    data = oldData.read(oldPage["bytes"][1])
+    ends = oldFile.end[start:start + count]
+    if not config.dropFinishedAuctions or lastUpdated is None or min(ends, default=lastUpdated + 1) > lastUpdated:
+        f.write(data) # Nothing ended, copy the whole thing
+        columns.addRows(oldFile, start, count)
+        return
+
+    lines = data.splitlines(keepends=True) # One auction per line, in the same order as the rows
+    f.writelines(lines[row] for row in range(count) if ends[row] > lastUpdated)
+    runStart = 0 # Copy the columns in runs of kept rows, not one row at a time
+    for row in range(count + 1):
+        if row == count or ends[row] <= lastUpdated: # The end of a run
+            if row > runStart: columns.addRows(oldFile, start + runStart, row - runStart)
+            runStart = row + 1
+
+
+_lastUpdate = (None, "Never") # (file version, text), so the file is only read when it changes
+
+
+def lastUpdate():
+    """Returns when the AH data was last updated, as text, or "Never" """
+    global _lastUpdate
+    try:
+        stat = os.stat(LAST_UPDATE_PATH)
+    except FileNotFoundError: return "Never"
+    version = (stat.st_mtime_ns, stat.st_size)
+    if _lastUpdate[0] != version:
+        with open(LAST_UPDATE_PATH, "r") as f:
+            _lastUpdate = (version, f.read())
+    return _lastUpdate[1]
+
+
+def _pageAuctions(pages, progress=None):
+    """Yields the list of auctions on each page, calling progress after each one"""
+    for pageNumber, totalPages, pageData in pages:
+        yield pageData["auctions"]
+        if progress is not None: progress(pageNumber + 1, totalPages)
+
+
+def iterAuctions(path=DATA_PATH):
+    """Yields every stored auction, one at a time"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+
+def loadAuctions(path=DATA_PATH):
+    """Returns a list of every stored auction"""
+    return list(iterAuctions(path))
+
+
+class Snapshot():
+    """
+    The stored auction house data, as columns (one array per field
+    we care about) read straight out of the memory mapped snapshot file.
+    Auction number i is end[i], startingBid[i], highestBid[i], isBin[i]
+    and nameIndex.nameIds[i].
+
+    If numpy is installed (and config.useNumpy is on) the columns are
+    numpy arrays, and vectorized is True. Either way they share memory
+    with the file, nothing is copied.
+
+    version is whatever snapshotVersion() was when it was loaded,
+    so we can tell when the files on disk have changed.
+
+    topK is the best auctions of each name (see topKIndex.py),
+    or None if there isn't a AHTopK.json for this snapshot.
+    """
+    def __init__(self, snapshotFile, version=None, topK=None):
+        self.file = snapshotFile # Keeps the file mapped for as long as the snapshot is around
+        end, startingBid, highestBid, isBin = snapshotFile.end, snapshotFile.startingBid, snapshotFile.highestBid, snapshotFile.isBin
+        numpy = loadNumpy()
+        self.vectorized = numpy is not None
+        if self.vectorized:
+            end, startingBid, highestBid = (_asNumpy(column, numpy.int64) for column in (end, startingBid, highestBid))
+            isBin = _asNumpy(isBin, numpy.bool_)
+            self.nameIdColumn = _asNumpy(snapshotFile.nameIds, numpy.uint32)
+        self.end = end
+        self.startingBid = startingBid
+        self.highestBid = highestBid
+        self.isBin = isBin
+        self.nameIndex = NameIndex(snapshotFile.names, snapshotFile.nameIds)
+        self.topK = topK
+        self.version = version
+
+    def __len__(self):
+        return len(self.end)
+
+
+_numpy = False # Not imported yet
+
+
+def loadNumpy():
+    """
+    Returns the numpy module, or None if it isn't installed or config.useNumpy is off.
+    It's only imported the first time something needs it, it's slow to import.
+    """
+    global _numpy
+    if not config.useNumpy: return None
+    if _numpy is False:
+        try: import numpy as _numpy # Optional, makes searching a whole lot faster
+        except ImportError: _numpy = None
+    return _numpy
+
+
+def _asNumpy(column, dtype):
+    """Turns a column into a numpy array that shares its memory, no copying"""
+    numpy = loadNumpy()
+    if not len(column): return numpy.zeros(0, dtype) # frombuffer doesn't like empty buffers
+    return numpy.frombuffer(column, dtype=dtype)
+
+
+@profiler.profiled("convert snapshot")
+def convertSnapshot(path=DATA_PATH, topKPath=TOPK_PATH):
+    """
+    Writes a new binary snapshot file (and top k file) for AH data that doesn't
+    have one yet, and returns its path
+    """
+    columns = ColumnBuilder()
+    for auction in iterAuctions(path):
+        columns.add(auction)
+    topK = TopKBuilder(config.ahNum, config.binNum)
+    topK.addRows(columns, 0, len(columns))
+    newSnapshot = _newSnapshotPath()
+    columns.write(newSnapshot)
+    topK.write(topKPath, newSnapshot, len(columns.names))
+    _removeOldSnapshots()
+    return newSnapshot
+
+
+# A snapshot file is never replaced, since it can be memory mapped (by this
+# process, or the parallelPricing workers) while it's being replaced, and
+# Windows doesn't allow that. Each new one gets the next number instead, and
+# the old ones are deleted once nothing has them open any more.
+
+def _snapshotNumbers():
+    """Returns {number: path} for every snapshot file in AH_DIR"""
+    try: fileNames = os.listdir(AH_DIR)
+    except FileNotFoundError: return {}
+    numbers = {}
+    for fileName in fileNames:
+        number = fileName[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+        if fileName.startswith(SNAPSHOT_PREFIX) and fileName.endswith(SNAPSHOT_SUFFIX) and number.isdigit():
+            numbers[int(number)] = os.path.join(AH_DIR, fileName)
+    return numbers
+
+
+def snapshotPath():
+    """Returns the path of the current snapshot file (the newest one), or None if there isn't one"""
+    numbers = _snapshotNumbers()
+    return numbers[max(numbers)] if numbers else None
+
+
+def _newSnapshotPath():
+    numbers = _snapshotNumbers()
+    return os.path.join(AH_DIR, f"{SNAPSHOT_PREFIX}{max(numbers, default=0) + 1}{SNAPSHOT_SUFFIX}")
+
+
+def _removeOldSnapshots():
+    """Deletes every snapshot file but the current one, unless it's still open somewhere"""
+    numbers = _snapshotNumbers()
+    oldPaths = [path for number, path in numbers.items() if number != max(numbers)]
+    oldPaths.append(os.path.join(AH_DIR, "AHData.bin")) # From before the snapshots were numbered
+    for path in oldPaths:
+        try: os.remove(path)
+        except (FileNotFoundError, PermissionError): pass # Already gone, or still mapped (on Windows) and it'll go next time
+
+
+@profiler.profiled("load snapshot")
+def loadSnapshot():
+    """Opens the snapshot file, making it first if the AH data is newer than it"""
+    currentSnapshot = snapshotPath()
+    if currentSnapshot is None or os.path.getmtime(currentSnapshot) < os.path.getmtime(DATA_PATH):
+        currentSnapshot = convertSnapshot()
+    version = snapshotVersion() # After converting, so it counts the new snapshot file
+    return Snapshot(SnapshotFile(currentSnapshot), version, loadTopK(TOPK_PATH, currentSnapshot))
+
+
+def snapshotVersion():
+    """
+    Returns something that changes whenever the stored AH data does
+    (the modification time and size of the data, snapshot and last update files)
+    """
+    version = []
+    for path in (DATA_PATH, snapshotPath() or "", LAST_UPDATE_PATH): # ("" never exists)
+        try:
+            stat = os.stat(path)
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError: version.append(None)
+    return tuple(version)
+
+
+_snapshot = None # The snapshot used by the whole program
+_snapshotLock = threading.Lock()
+
+
+def getSnapshot():
+    """
+    Returns the stored AH data, only actually reading the file the first time
+    and whenever the file has changed since it was last read.
+    """
+    global _snapshot
+    with _snapshotLock:
+        version = snapshotVersion()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = loadSnapshot()
+        return _snapshot
@@ -0,0 +1,181 @@
+#! python3
+
+# Times the slow parts of the organizer on made up auction house data
+# (see syntheticMarket.py): decoding pages, storing and loading snapshots, ahSearch,
+# binSearch, repricing whole wishlists and drawing the item list.
+
+# Every result is one line of json, with the keys always in the same order,
+# so runs from different versions can be diffed or loaded into a spreadsheet.
+
+# Usage:
+#   python benchmarks/runBenchmarks.py
+#   python benchmarks/runBenchmarks.py --auctions 10000 100000 1000000 --output results.jsonl
+
+import os, sys, json, time, shutil, argparse, tempfile, tracemalloc, subprocess # Standard library modules
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # So the organizer can be imported
+
+import config # The config file
+import auctionData, pricing, ahDownloader # The organizer itself
+from syntheticMarket import makeMarket, makeWishlist # Made up data
+
+
+QUERIES = ["enchanted book", "hyperion", "✪✪✪✪✪", "dragon", "sword", "pet skin", "nothing sells this"]
+
+
+def codeVersion():
+    """The git commit being benchmarked, if there is one"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: return None
+
+
+def measure(function, repeats):
+    """
+    Runs function <repeats> times, returns (median seconds, peak memory in bytes).
+    Memory is measured on a separate run, tracemalloc slows things down.
+    """
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return timings[len(timings) // 2], peak
+
+
+class Results():
+    def __init__(self, output, common):
+        self.output = output
+        self.common = common
+
+    def add(self, benchmark, params, seconds, peakMemory, operations, unit):
+        result = {"benchmark": benchmark, "params": params, "seconds": round(seconds, 6),
+                  "throughput": round(operations / seconds, 1) if seconds else None, "throughputUnit": unit,
+                  "peakMemoryBytes": peakMemory, **self.common}
+        self.output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.output.flush()
+
+
+def freshSnapshot():
+    """Forgets the loaded snapshot and cached prices, so the next search starts cold"""
+    auctionData._snapshot = None
+    pricing._priceCache = pricing.PriceCache(config.priceCacheSize)
+
+
+def benchmarkMarket(results, auctionCount, args):
+    params = {"auctions": auctionCount, "names": args.names, "binRatio": args.bin_ratio}
+
+    # Decoding the pages as they come from the API (as bytes), keeping only the fields we store
+    encodedPages = [json.dumps(pageData).encode("utf-8") for pageNumber, totalPages, pageData
+                    in makeMarket(auctionCount, args.names, args.bin_ratio, seed=args.seed)]
+    def decode():
+        for content in encodedPages: ahDownloader.decodePage(content)
+    seconds, peak = measure(decode, args.repeats)
+    results.add("pageDecode", dict(params, pageBytes=sum(map(len, encodedPages))), seconds, peak, auctionCount, "auctions/s")
+    del encodedPages
+
+    def store():
+        if os.path.exists(auctionData.META_PATH): os.remove(auctionData.META_PATH) # Store it all, even if lastUpdated is the same
+        auctionData.storePages(makeMarket(auctionCount, args.names, args.bin_ratio, seed=args.seed))
+    # Making up the data is part of the timing here, so time that on its own too
+    generate = lambda: sum(1 for page in makeMarket(auctionCount, args.names, args.bin_ratio, seed=args.seed))
+    seconds, peak = measure(generate, 1)
+    results.add("generateMarket", params, seconds, peak, auctionCount, "auctions/s")
+    seconds, peak = measure(store, 1)
+    results.add("snapshotSave", params, seconds, peak, auctionCount, "auctions/s")
+
+    if auctionData.snapshotPath() is not None: # Time turning the ndjson into a snapshot file too
+        def convert():
+            auctionData.convertSnapshot()
+        seconds, peak = measure(convert, 1)
+        results.add("snapshotConvert", params, seconds, peak, auctionCount, "auctions/s")
+
+    if config.storageBackend == "sqlite": # Nothing to load, the searches go straight to the database
+        freshSnapshot()
+    else:
+        def load():
+            freshSnapshot()
+            auctionData.getSnapshot()
+        seconds, peak = measure(load, args.repeats)
+        results.add("snapshotLoad", params, seconds, peak, auctionCount, "auctions/s")
+
+    for name, search in (("ahSearch", pricing.ahSearch), ("binSearch", pricing.binSearch)):
+        search(QUERIES[0]) # Get everything loaded, only time the searching
+        def searchAll():
+            pricing._priceCache = pricing.PriceCache(config.priceCacheSize) # No cheating with the cache
+            for query in QUERIES: search(query)
+        seconds, peak = measure(searchAll, args.repeats)
+        results.add(name, params, seconds, peak, len(QUERIES), "searches/s")
+
+    for itemCount in args.wishlists:
+        itemList = makeWishlist(itemCount, args.names, seed=args.seed)
+        names = [item["Name"] for item in itemList]
+        def reprice():
+            pricing._priceCache = pricing.PriceCache(config.priceCacheSize)
+            pricing.repriceItems(itemList, pricing.priceItems(names))
+        seconds, peak = measure(reprice, args.repeats)
+        results.add("wishlistReprice", dict(params, wishlist=itemCount), seconds, peak, itemCount, "items/s")
+
+
+def benchmarkUpdateList(results, args):
+    """Times MainWindow.updateList, if there is a screen to make a window on"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e: # No display, or no tkinter
+        print(f"Skipping updateList: {e}", file=sys.stderr)
+        return
+    root.withdraw()
+    import main, wishlistModel # The GUI
+    app = main.MainWindow(root)
+    for itemCount in args.wishlists:
+        app.setWishlist(makeWishlist(itemCount, args.names, seed=args.seed))
+        sortKeys = iter(wishlistModel.SORT_KEYS * (args.repeats + 1))
+        def render():
+            app.wishlistView.sortBy(next(sortKeys)) # Something to actually redraw
+            app.updateList()
+            root.update_idletasks() # Make tk actually do the work (the redraw waits for idle)
+        seconds, peak = measure(render, args.repeats)
+        results.add("updateList", {"wishlist": itemCount}, seconds, peak, itemCount, "items/s")
+    root.destroy()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the organizer on made up AH data")
+    parser.add_argument("--auctions", type=int, nargs="+", default=[10000, 100000], help="Market sizes to try")
+    parser.add_argument("--names", type=int, default=3000, help="Different item names in the market")
+    parser.add_argument("--bin-ratio", type=float, default=0.7, help="Fraction of auctions that are BIN")
+    parser.add_argument("--wishlists", type=int, nargs="+", default=[10, 100, 1000, 10000], help="Wishlist sizes to try")
+    parser.add_argument("--repeats", type=int, default=5, help="Runs per timing, the median is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["file", "sqlite"], default=config.storageBackend)
+    parser.add_argument("--no-gui", action="store_true", help="Don't time updateList")
+    parser.add_argument("--output", help="File to add the results to, instead of printing them")
+    args = parser.parse_args(argv)
+
+    config.storageBackend = args.backend
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    results = Results(output, {"backend": args.backend, "numpy": auctionData.loadNumpy() is not None,
+                               "python": sys.version.split()[0], "code": codeVersion()})
+
+    workDir = tempfile.mkdtemp(prefix="sbpo-bench-") # The organizer uses relative paths, so work somewhere safe
+    oldDir = os.getcwd()
+    os.chdir(workDir)
+    try:
+        for auctionCount in args.auctions:
+            benchmarkMarket(results, auctionCount, args)
+        if not args.no_gui: benchmarkUpdateList(results, args)
+    finally:
+        os.chdir(oldDir)
+        shutil.rmtree(workDir, ignore_errors=True)
+        if output is not sys.stdout: output.close()
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,109 @@
+#! python3
+
+# Makes up realistic looking auction house data, for benchmarking
+# without hammering the API (or waiting for it).
+
+# Item popularity follows a zipf distribution like the real thing: a few
+# items (enchanted books, pet skins...) have thousands of auctions, most
+# items only have a couple.
+
+import random, bisect, itertools # Standard library modules
+
+
+BASE_NAMES = ["Enchanted Book", "Aspect of the End", "Hyperion", "Juju Shortbow", "Enchanted Diamond",
+              "Wise Dragon Helmet", "Superior Dragon Chestplate", "Strong Dragon Leggings", "Pet Skin",
+              "Spirit Sceptre", "Livid Dagger", "Shadow Fury", "Giant's Sword", "Necron's Chestplate",
+              "Enchanted Iron", "Grappling Hook", "Treecapitator", "Hot Potato Book", "Recombobulator 3000",
+              "Summoning Eye", "Judgement Core", "Bonzo's Staff", "Midas' Sword", "Ender Artifact"]
+PREFIXES = ["", "", "", "Heroic ", "Fabled ", "Withered ", "Sharp ", "Spiritual ", "Ancient ", "Renowned ", "Fast "]
+SUFFIXES = ["", "", "", " ✪", " ✪✪", " ✪✪✪✪✪", " II", " IV"]
+TIERS = ["COMMON", "UNCOMMON", "RARE", "EPIC", "LEGENDARY", "MYTHIC"]
+
+
+def makeNames(nameCount, rng):
+    """Returns nameCount different item names"""
+    names = []
+    seen = set()
+    for base, prefix, suffix in itertools.product(BASE_NAMES, PREFIXES, SUFFIXES):
+        name = f"{prefix}{base}{suffix}"
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    rng.shuffle(names)
+    number = 0
+    while len(names) < nameCount: # More names than we can make up nicely, pad with pets
+        number += 1
+        names.append(f"[Lvl {number % 100 + 1}] Pet {number}")
+    return names[:nameCount]
+
+
+def makeFiller(rng, count=64):
+    """
+    Some lore and item bytes to reuse. Making up new random text for every
+    auction is slower than actually storing it, and nothing reads it anyway.
+    """
+    lore = ["§7" + " ".join(rng.choice(BASE_NAMES) for i in range(20)) for i in range(count)]
+    itemBytes = ["H4sIAAAAAAAAAE1S" + "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdef0123456789") for i in range(300))
+                 for i in range(count)]
+    return lore, itemBytes
+
+
+def makeAuction(rng, name, isBin, now, index, filler):
+    startingBid = int(rng.lognormvariate(12, 2)) + 1
+    auction = {
+        "uuid": f"{index:032x}",
+        "auctioneer": f"{rng.getrandbits(128):032x}",
+        "profile_id": f"{rng.getrandbits(128):032x}",
+        "coop": [],
+        "start": now - rng.randint(0, 86400000),
+        "end": now + rng.randint(0, 14 * 86400000),
+        "item_name": name,
+        "item_lore": rng.choice(filler[0]),
+        "extra": name + " " + rng.choice(BASE_NAMES),
+        "category": rng.choice(["weapon", "armor", "accessories", "consumables", "blocks", "misc"]),
+        "tier": rng.choice(TIERS),
+        "starting_bid": startingBid,
+        "item_bytes": rng.choice(filler[1]),
+        "claimed": False,
+        "claimed_bidders": [],
+        "highest_bid_amount": 0 if isBin or rng.random() < 0.4 else int(startingBid * rng.uniform(1, 3)),
+        "bids": [],
+    }
+    if isBin: auction["bin"] = True # Like the API, the key is only there for BIN auctions
+    return auction
+
+
+def makeMarket(auctionCount, nameCount=3000, binRatio=0.7, zipfExponent=1.1, pageSize=1000, seed=0, now=1600000000000):
+    """
+    Yields (pageNumber, totalPages, pageData) like ahDownloader.iterPages(),
+    for a made up auction house with auctionCount auctions.
+    """
+    rng = random.Random(seed)
+    names = makeNames(nameCount, rng)
+    filler = makeFiller(rng)
+    weights = list(itertools.accumulate(1 / (rank + 1) ** zipfExponent for rank in range(nameCount)))
+    totalPages = max((auctionCount + pageSize - 1) // pageSize, 1)
+
+    index = 0
+    for pageNumber in range(totalPages):
+        auctions = []
+        for i in range(min(pageSize, auctionCount - index)):
+            name = names[bisect.bisect(weights, rng.random() * weights[-1])]
+            auctions.append(makeAuction(rng, name, rng.random() < binRatio, now, index, filler))
+            index += 1
+        yield pageNumber, totalPages, {"success": True, "page": pageNumber, "totalPages": totalPages,
+                                       "totalAuctions": auctionCount, "lastUpdated": now, "auctions": auctions}
+
+
+def makeWishlist(itemCount, nameCount=3000, seed=0):
+    """Returns an item list (like in userSaves) of itemCount items, searching for parts of market names"""
+    rng = random.Random(seed)
+    names = makeNames(nameCount, random.Random(seed)) # Same names as makeMarket() with the same seed
+    itemList = []
+    for i in range(itemCount):
+        name = rng.choice(names)
+        if rng.random() < 0.5: name = name.split(" ", 1)[-1] # Partial names, like people actually type
+        itemList.append({"Name": name, "Priority": rng.randint(0, 10), "UserCost": rng.randint(1, 10 ** 7),
+                         "AHCost": -1, "AHUpdateTime": "Thu Jan  1 00:00:00 2020",
+                         "BINCost": -1, "BINUpdateTime": "Thu Jan  1 00:00:00 2020"})
+    return itemList
@@ -42,3 +42,91 @@ binNum = 6
 # Setting this negative will cause all sorts of problems, including
 # possible getting the average of the highest price items
 # and having the end average be negative
+
+
+downloadWorkers = 8
+# The number of auction house pages to download at the same time
+# when updating the AH data. Higher is faster, but don't go crazy,
+# the API might not like getting hammered.
+
+
+useNumpy = True
+# Either True or False, whether or not to use numpy (if it's installed)
+# to search the AH data. It's much faster, but if you don't have numpy
+# everything still works, just slower.
+
+
+storageBackend = "file"
+# Either "file" or "sqlite", where to store the AH data and user wishlists.
+# "file" keeps the AH data in the auctionHouse folder and each user in their
+# own file in userSaves. "sqlite" keeps everything in auctionHouse/AHData.db,
+# which doesn't need to be loaded before searching.
+
+
+ahRefreshMinutes = 0
+# How often to update the AH data in the background, in minutes, while
+# the window is open. 0 means only when you click "Update AH Data".
+
+
+priceCacheSize = 4096
+# How many price estimates to remember, so the same search doesn't
+# have to be done twice. They are forgotten whenever the AH data updates.
+
+
+startupTargetMs = 150
+# How long importing the program is allowed to take, in milliseconds.
+# Only used by startupTime.py, to check nothing slow gets imported at startup.
+
+
+auctionsURL = "https://api.hypixel.net/skyblock/auctions"
+# Where to download the AH data from. You shouldn't need to change this,
+# unless you want to test against your own copy of the API.
+
+
+archiveSnapshots = False
+# Either True or False, whether or not to keep every AH snapshot in
+# auctionHouse/archive instead of just the latest one (only with the "file"
+# storage backend). Auctions that didn't change are only stored once, so this
+# takes a lot less space than keeping copies. See ahArchive.py.
+
+
+recordPriceHistory = True
+# Either True or False, whether or not to save every item's AH and BIN price
+# each time the AH data is updated, in auctionHouse/priceHistory.db.
+# See priceHistory.py.
+
+
+autosaveSeconds = 2
+# How long to wait after a wishlist changes before saving it, in seconds.
+# Lots of changes close together (like updating every price) get saved
+# in one go. Anything not saved yet is saved when the window closes.
+
+
+pricingWorkers = 0
+# How many processes to split the auctions between when working out lots of
+# prices at once (like updating every price), to use more than one core.
+# 0 means don't, which is best unless the auction house is huge.
+# This is only a fallback: every store writes AHTopK.json, and that gets
+# checked first (and with numpy, one is worked out in memory instead), so
+# the workers only run with the "file" storage backend, no numpy, and no
+# up to date AHTopK.json (like when ahNum or binNum went up since the last store).
+
+
+parallelMinAuctions = 200000
+# With pricingWorkers on, only split the auctions up if there are at least
+# this many. Starting the workers and sending them the work takes a moment,
+# so for smaller auction houses one process is quicker.
+
+
+auctionFields = ["uuid", "item_name", "bin", "end", "starting_bid", "highest_bid_amount"]
+# The fields of each auction to keep when downloading the AH data. Everything
+# else (the lore, item bytes, bids...) is thrown away as each page is read,
+# which makes the stored data a lot smaller. item_name, bin, end, starting_bid
+# and highest_bid_amount are needed for the prices, and uuid for archiving.
+# Changing this downloads everything again next update.
+
+
+dropFinishedAuctions = True
+# Either True or False, whether or not to throw away claimed auctions, and
+# auctions that had already ended, when downloading the AH data. They can't
+# be bought any more, so they shouldn't count towards prices.
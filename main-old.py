@@ -2,11 +2,10 @@
 
 import time, datetime, sys, json # Standard library modules
 
-import requests # Import other modules
-
-from tabulate import tabulate # Prints data quite nicely
-
 import config # The config file
+from auctionData import ingestAH, lastUpdate # The stored AH data
+from userData import loadUserItems, saveUserItems # Loading and saving item lists
+from pricing import ahSearch, binSearch, priceItems # Price estimates from the AH data
 
 from colorama import Style, Fore, Back, init
         # Allows us to use colored text
@@ -97,145 +96,37 @@ if not config.useColor: # for some reason, the user doesn't want colored text.
 
 
 def updateAH():
-    """Update the AH data stored in AHData.json"""
+    """Update the stored AH data"""
     print(f"{Fore.GREEN} Updating AH...")
-    data = [] # The list of individual auction items
-    currentPage = 0 # The page to get
-    while True:
-        # get all pages of ah data
-
-        pageData = requests.get(f"https://api.hypixel.net/skyblock/auctions?key={config.APIKey}&page={currentPage}").text 
-        # API Key might not be needed for this!
-
-        # Sure, I could use requests.get().json() but im not.
-
-        dec = json.JSONDecoder() #Create a json decoder
-        pageData = dec.decode(pageData) # make data a workable python object list
-
-        maxPage = pageData["totalPages"]
-
-        print(f"{Fore.GREEN}Got data for page {currentPage} of {maxPage}")
-
-        data.extend(pageData["auctions"]) # we don't care about the other stuff
+    def showProgress(pagesDone, totalPages):
+        print(f"{Fore.GREEN}Got data for page {pagesDone} of {totalPages}")
 
-        if currentPage == maxPage:
-            print(f"{Fore.GREEN}Finished getting data.")
-            break
+    ingestAH(progress=showProgress) # Pages are written to disk as they come in
+    print(f"{Fore.GREEN}Finished getting data.")
 
-
-        # time.sleep(0.6) # We don't wan't to go over the throttle limit, so just in case
-                        # Let's also make it a bit larger than it needs to be, again, just in case
-                        # though really, this is so slow, I doubt it matters.
-        # Commented out because you don't actually need to supply a valid
-        # api key, therefore you don't need to be worried about getting it banned.
-
-        currentPage += 1 # get a new page next time
-
-    with open("auctionHouse/AHData.json","w") as f: # Overwrite old data
-        json.dump(data, f) # Dump all of the data, as json again, into a file
-    with open("auctionHouse/AHLastUpdate.txt","w") as f:
-        f.write(time.asctime())
     print("Stored auction house data sucessfully")
 
 
-def ahSearch(item):
-    """
-    Searches the stored Auction House data for an item,
-    and returns the average of the 10 auctions
-    closest to ending. Returns an integer of
-    price, and a timestamp
-    """
-    # Open AHData file and make the data a list
-    with open("auctionHouse/AHData.json","r") as f:
-        data = json.load(f)
-
-    # We now have a list of all the data. Now, search all entries for item
-    matchedAuctions = []
-    for auction in data:
-        if item.lower() in auction["item_name"].lower():
-            try:
-                auction["bin"] # make sure its not BIN
-                # This will raise an error if it's not BIN
-
-            except KeyError: matchedAuctions.append(auction)
-
-    # We now have a list of all the auctions who's name matches the desired item
-    # Now, find the <num> auctions closest to ending
-
-    matchedAuctions.sort(key=lambda x: x["end"]) # First time using lambda! 
-    matchedAuctions = matchedAuctions[:config.ahNum] # Get the first <num>
-
-    # Get average of highest bids, and return it
-
-    price = 0
-    for auction in matchedAuctions:
-        price += auction["highest_bid_amount"]
-
-    return price // config.ahNum # Return the average
-
-
-
-def binSearch(item):
-    """
-    Searches the stored BIN catagoty of the Auction 
-    House data for an item, and returns the average
-    of the 10 lowest prices. Returns an integer of
-    price, and a timestamp
-    """
-    # Open AHData file and make the data a list
-    with open("auctionHouse/AHData.json","r") as f:
-        data = json.load(f)
-
-    # We now have a list of all the data. Now, search all entries for item
-    matchedAuctions = []
-    for auction in data:
-        if item.lower() in auction["item_name"].lower():
-            try:
-                auction["bin"] # make sure its not BIN
-                # This will raise an error if it's not BIN
-                matchedAuctions.append(auction)
-
-            except KeyError: pass
-
-    # We now have a list of all the BIN auctions who's name matches the desired item
-    # Now, find the <num> auctions with the lowest price
-
-    matchedAuctions.sort(key=lambda x: x["starting_bid"]) # First time using lambda! 
-    matchedAuctions = matchedAuctions[:config.binNum] # Get the first <num>
-
-    # Get average of price, and return it
-
-    price = 0
-    for auction in matchedAuctions:
-        price += auction["starting_bid"]
-
-    return price // config.binNum # Return the average
-
 
 
 def main():
     # So, first we need to load the user's saved purchase list from the shelve file.
 
-    try:
-        userID = input("User ID: ") # Used later while saving
-        with open(f"userSaves/items{userID}.json","r") as f:
-            itemList = json.load(f)
-            print(f"{Fore.GREEN} Loaded itemlist for ID: {userID}")
-
+    userID = input("User ID: ") # Used later while saving
+    itemList = loadUserItems(userID)
+    newUser = False # Not saved until something is added, so a mistyped ID doesn't leave an empty save behind
+    if itemList is not None:
+        print(f"{Fore.GREEN} Loaded itemlist for ID: {userID}")
 
-    except FileNotFoundError:
+    else:
         if "y" in input(f"{Fore.YELLOW}User ID not found. Create new one? (y/n) ").lower():
             # Create a new user ID
             itemList = [] 
-
-            with open(f"userSaves/items{userID}.json","w") as f: # Create a new items file for this user.
-                json.dump([],f) # Just in case the user doesn't save, they don't need to create a new ID again
-
+            newUser = True
             print(f"{Fore.GREEN} Created new user ID {userID}")
 
 
-    try: itemList # This will raise an error if no actual list was loaded
-    except: sys.exit(f"{Fore.RED}No valid item list loaded") # Quit the program
+    if itemList is None: sys.exit(f"{Fore.RED}No valid item list loaded") # Quit the program
 
     # By now we should have a valid itemlist
     print(f"{Fore.GREEN}Press ? for a list of commands")
@@ -254,8 +145,8 @@ List (param)                  : List the items by (param)
 Quit                          : Quit this program
             """)
         if "list" in cmd.lower():
-            with open("auctionHouse/AHLastUpdate.txt","r") as f:
-                print(f"{Fore.CYAN}Last AH Data Update: {f.read()}")
+            print(f"{Fore.CYAN}Last AH Data Update: {lastUpdate()}")
+            from tabulate import tabulate # Prints data quite nicely. Imported here so the program starts faster
             cmd = cmd.replace("list","").strip() # Not in a regexy mood today
                                                  # It needs to match both "list" and "list " 
             if not cmd:
@@ -280,11 +171,12 @@ Quit                          : Quit this program
 
         elif cmd == "update":
             if config.ahSearch:
+                prices = priceItems([item["Name"] for item in itemList]) # AH and BIN for everything, in one go
                 for item in itemList:
                     print("\n\n")
                     if str(item["AHUpdateTime"]) != "-1": # Make sure the user wants it to be checked
                                                         # Better safe than sorry with the Str stuff
-                        newCost = ahSearch(item["Name"])
+                        newCost = prices[item["Name"]][0]
                         print(f"Got new cost for {item['Name']} of {newCost}")
                         print(f"Old cost was {item['AHCost']}")
                         if item["AHCost"] - newCost > 0: # Positive = price went down
@@ -305,7 +197,7 @@ Quit                          : Quit this program
 
                     if str(item["BINUpdateTime"]) != "-1": # Make sure the user wants it to be checked
                                                         # Better safe than sorry with the Str stuff
-                        newCost = binSearch(item["Name"])
+                        newCost = prices[item["Name"]][1]
                         print(f"Got new BIN cost for {item['Name']} of {newCost}")
                         print(f"Old cost was {item['BINCost']}")
                         if item["BINCost"] - newCost > 0: # Positive = price went down
@@ -327,8 +219,8 @@ Quit                          : Quit this program
 
 
         elif cmd == "save":
-            with open(f"userSaves/items{userID}.json","w") as f:
-                json.dump(itemList, f)
+            saveUserItems(userID, itemList)
+            newUser = False
 
         elif cmd == "remove":
             done = False
@@ -394,5 +286,8 @@ Quit                          : Quit this program
                 "BINCost":BINPrice,
                 "BINUpdateTime":BINUpdateTime
                 }) # Actually add the item to the itemlist           
+            if newUser: # Their first item, so the user is real now
+                saveUserItems(userID, itemList) # Just in case the user doesn't save, they don't need to create a new ID again
+                newUser = False
 
 if __name__ == "__main__": main() # Unless someone is importing this, run main() 
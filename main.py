@@ -1,13 +1,18 @@
 #! python3
 
-import time, datetime, sys, json # Standard library modules
+import time, datetime, sys, json, argparse # Standard library modules
 import tkinter as tk
+import tkinter.scrolledtext as st
 from tkinter.ttk import Progressbar
 
-import requests # Import other modules
-from tabulate import tabulate # Prints data quite nicely
-
 import config # The config file
+import profiler # Timing for --profile
+from refreshScheduler import RefreshScheduler # Updates the AH data in the background
+from wishlistStore import WishlistStore # Loading and autosaving item lists
+from auctionData import lastUpdate # When the AH data was last updated
+from wishlistModel import WishlistModel # The items, kept sorted
+from wishlistView import WishlistView # The table of items
+from pricing import binSearch, priceItems # Price estimates from the AH data
 
 
 helpText = """
@@ -35,90 +40,13 @@ stored AH data.
 The "Update AH Prices" and "Update BIN Prices"
 update the prices for all the items already added.
 
-Before closing, make sure to click "Save"
-
-"""
-
-
-
-
-def ahSearch(item):
-    """
-    Searches the stored Auction House data for an item,
-    and returns the average of the 10 auctions
-    closest to ending. Returns an integer of
-    price, and a timestamp
-    """
-    # Open AHData file and make the data a list
-    with open("auctionHouse/AHData.json","r") as f:
-        data = json.load(f)
-    
-    # We now have a list of all the data. Now, search all entries for item
-    matchedAuctions = []
-    for auction in data:
-        if item.lower() in auction["item_name"].lower():
-            try:
-                auction["bin"] # make sure its not BIN
-                # This will raise an error if it's not BIN
-
-            except KeyError: matchedAuctions.append(auction)
-    
-    # We now have a list of all the auctions who's name matches the desired item
-    # Now, find the <num> auctions closest to ending
-
-    matchedAuctions.sort(key=lambda x: x["end"]) # First time using lambda! 
-    matchedAuctions = matchedAuctions[:config.ahNum] # Get the first <num>
-
-    # Get average of highest bids, and return it
-
-    price = 0
-    for auction in matchedAuctions:
-        price += auction["highest_bid_amount"]
-
-    return price // config.ahNum # Return the average
-    
-
-
-def binSearch(item):
-    """
-    Searches the stored BIN catagoty of the Auction 
-    House data for an item, and returns the average
-    of the 10 lowest prices. Returns an integer of
-    price, and a timestamp
-    """
-    # Open AHData file and make the data a list
-    with open("auctionHouse/AHData.json","r") as f:
-        data = json.load(f)
-    
-    # We now have a list of all the data. Now, search all entries for item
-    matchedAuctions = []
-    for auction in data:
-        if item.lower() in auction["item_name"].lower():
-            try:
-                auction["bin"] # make sure its not BIN
-                # This will raise an error if it's not BIN
-                matchedAuctions.append(auction)
-
-            except KeyError: pass
-    
-    # We now have a list of all the BIN auctions who's name matches the desired item
-    # Now, find the <num> auctions with the lowest price
-
-    matchedAuctions.sort(key=lambda x: x["starting_bid"]) # First time using lambda! 
-    matchedAuctions = matchedAuctions[:config.binNum] # Get the first <num>
-
-    # Get average of price, and return it
-
-    price = 0
-    for auction in matchedAuctions:
-        price += auction["starting_bid"]
-
-    return price // config.binNum # Return the average
-
-
-
+Click a column heading to sort by it,
+and click it again to reverse the order.
 
+Changes are saved by themselves a moment
+after you make them. "Save" saves them right now.
 
+"""
 
 
 
@@ -140,68 +68,22 @@ class LoadWindow(tk.Toplevel):
         self.progress_bar.grid(row=1,column=0)
 
         self.progress_bar['value'] = 0
-        self.load()
-    
-    def load(self):
-        data = [] # The list of individual auction items
-        currentPage = 0 # The page to get
-        while True:
-            # get all pages of ah data
-            self.update()
-                        # this forces a refresh of the screen
-                        # it DOES slow down the program, but I think its better to 
-                        # have a progress bar instead of the program just seeming to hang
-                      
-
-            pageData = requests.get(f"https://api.hypixel.net/skyblock/auctions?key={config.APIKey}&page={currentPage}").text 
-            # API Key might not be needed for this!
-
-            # Sure, I could use requests.get().json() but im not.
-
-            dec = json.JSONDecoder() #Create a json decoder
-            pageData = dec.decode(pageData) # make data a workable python object list
 
-            maxPage = pageData["totalPages"]
-
-            self.progress_StringVar.set(f"Downloading Data Pages: {currentPage}/{maxPage}")
-
-            self.progress_bar['value'] = self.progress_bar['value'] + 100/maxPage
-
-            data.extend(pageData["auctions"]) # we don't care about the other stuff
-
-            if currentPage == maxPage:
-                break
-
-            
-            # time.sleep(0.6) # We don't wan't to go over the throttle limit, so just in case
-                            # Let's also make it a bit larger than it needs to be, again, just in case
-                            # though really, this is so slow, I doubt it matters.
-            # Commented out because you don't actually need to supply a valid
-            # api key, therefore you don't need to be worried about getting it banned.
-
-            currentPage += 1 # get a new page next time
-        
-        with open("auctionHouse/AHData.json","w") as f: # Overwrite old data
-            json.dump(data, f) # Dump all of the data, as json again, into a file
-        with open("auctionHouse/AHLastUpdate.txt","w") as f:
-            f.write(time.asctime())
-
-           
+    # The download itself happens in the background (see refreshScheduler.py),
+    # these just get told how it's going
 
+    def showProgress(self, pagesDone, totalPages):
+        self.progress_StringVar.set(f"Downloading Data Pages: {pagesDone}/{totalPages}")
+        self.progress_bar['value'] = 100 * pagesDone / totalPages
 
+    def finished(self, message):
+        self.progress_StringVar.set(message)
         self.destroy_button = tk.Button(self,text="OK",command=self.destroy)
         self.destroy_button.grid(row=3)
 
 
 
 
-
-
-
-
-
-
-
 class MainWindow(tk.Frame):
 
     def __init__(self,master=None):
@@ -210,7 +92,14 @@ class MainWindow(tk.Frame):
         self.master.title("Skyblock Purchase Organizer")
         self.initWindow() # Create Widgets
         self.grid()
-        self.master.itemList = []
+        self.store = WishlistStore() # Every user's items, saved by itself a moment after they change
+        self.setWishlist([])
+        self.master.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.loadWindow = None # The download progress window, if it's open
+        self.refresher = RefreshScheduler(self, intervalMs=int(config.ahRefreshMinutes * 60 * 1000),
+            onProgress=self.refreshProgress, onDone=self.refreshDone, onError=self.refreshFailed)
+        self.refresher.start() # Keeps the AH data up to date in the background, if turned on in the config
 
     def initWindow(self): # Create the wiggets
 
@@ -255,48 +144,36 @@ class MainWindow(tk.Frame):
 
         # Now for the hard part: displaying all of the user's data
 
-        # First, we have to figure out what to sort by, so lets make a dropdown for that
-        self.sortByLabel = tk.Label(self,text="Sort By: ")
-        self.sortByLabel.grid(row=1,column=6)
-        self.sortByStrVar = tk.StringVar()
-        self.sortByStrVar.set("Alphabetical")
-        self.sortByMenu = tk.OptionMenu(self, self.sortByStrVar, "Alphabetical","BIN Price","AH Price","User Price","Priority",command=self.updateList)
-        self.sortByMenu.grid(row=1,column=7)
-    
-
-        self.outputArea = tk.Text(self,width=50,height=15,wrap="none")
-        self.verticalBar = tk.Scrollbar(self,orient="vertical",command=self.outputArea.yview)
-        self.horizontalBar = tk.Scrollbar(self,orient="horizontal",command=self.outputArea.xview)
-
-        self.outputArea.configure(yscrollcommand=self.verticalBar.set, xscrollcommand=self.horizontalBar.set)
+        # Sorting is done by clicking the column headings (see wishlistView.py)
+        self.lastUpdateStrVar = tk.StringVar()
+        self.lastUpdateStrVar.set("")
+        self.lastUpdateLabel = tk.Label(self, textvariable=self.lastUpdateStrVar)
+        self.lastUpdateLabel.grid(row=2,column=0,columnspan=8,sticky="w",padx=10)
 
-        self.outputArea.grid(row=3,pady=10,padx=10,columnspan=8, sticky="nsew")
-        self.verticalBar.grid(row=3, column=8, sticky="ns")
-        self.horizontalBar.grid(row=4, column=0, columnspan=8, sticky="ew")
+        self.wishlistView = WishlistView(self)
+        self.wishlistView.grid(row=3,pady=10,padx=10,columnspan=8, sticky="nsew")
 
         self.master.updateList = self.updateList # So that other windows can use it through the shared master
 
 
+    @profiler.profiled("updateList")
     def updateList(self,*args):
-        conversionDict = {"Alphabetical":"Name","BIN Price":"BINCost","AH Price":"AHCost","User Price":"UserCost","Priority":"Priority"}
-        sortBy = conversionDict[self.sortByStrVar.get()] # Just for readability of options
-
-
-        with open("auctionHouse/AHLastUpdate.txt","r") as f:
-            data = f"Last AH Data Update: {f.read()}\n"
-
-        #try:
-        newList = sorted(self.master.itemList, key=lambda k: k[sortBy]) 
-        data += tabulate(newList,headers="keys")
-        self.outputArea.configure(state ='normal')
-        self.outputArea.delete("1.0",tk.END)
-        self.outputArea.insert(tk.INSERT, data)
-        self.outputArea.configure(state ='disabled')
-           
-
+        self.lastUpdateStrVar.set(f"Last AH Data Update: {lastUpdate()}") # Only actually reads the file when it changes
+        self.wishlistView.refresh() # Only redraws once, however many times it's asked to
 
+    def setWishlist(self, itemList, username=None):
+        """
+        Shows a new item list (sorting it once, after that it's kept sorted as it changes).
+        If it's username's, changes to it get autosaved.
+        """
+        store = self.store if username is not None else None
+        self.master.wishlist = WishlistModel(itemList, store, username) # Shared with the other windows through the master
+        self.wishlistView.setModel(self.master.wishlist)
 
-       # except: self.messageStrVar.set("Invalid sort term")
+    def close(self):
+        """Saves anything that hasn't been saved yet, then closes"""
+        self.store.close()
+        self.master.destroy()
 
 
     def openHelp(self):
@@ -310,14 +187,16 @@ class MainWindow(tk.Frame):
         DeleteItemWindow(self.master)
      
 
+    @profiler.profiled("reprice AH")
     def updateAHPrices(self):
         if config.ahSearch:
             output = ""
-            for item in self.master.itemList:
+            prices = priceItems([item["Name"] for item in self.master.wishlist]) # Price everything in one go
+            for item in self.master.wishlist:
                 output += "\n\n"
                 if str(item["AHUpdateTime"]) != "-1": # Make sure the user wants it to be checked
                                                      # Better safe than sorry with the Str stuff
-                    newCost = ahSearch(item["Name"])
+                    newCost = prices[item["Name"]][0]
                     output += f"Got new cost for {item['Name']} of {newCost}\n"
                     output += f"Old cost was {item['AHCost']}\n"
                     if item["AHCost"] - newCost > 0: # Positive = price went down
@@ -328,8 +207,7 @@ class MainWindow(tk.Frame):
                         difference = newCost - item['AHCost']
                     output += f"Difference: {verb} {difference} coins\n"
                         
-                    item["AHCost"] = newCost
-                    item["AHUpdateTime"] = time.asctime()
+                    self.master.wishlist.update(item, AHCost=newCost, AHUpdateTime=time.asctime()) # Moves it in the sorted lists
 
                 else: output += f"Did not update AH for {item['Name']}\n"
             PriceResultWindow(output, self.master)
@@ -338,14 +216,16 @@ class MainWindow(tk.Frame):
 
 
 
+    @profiler.profiled("reprice BIN")
     def updateBINPrices(self):
         if config.ahSearch:
             output = ""
-            for item in self.master.itemList:
+            prices = priceItems([item["Name"] for item in self.master.wishlist]) # Price everything in one go
+            for item in self.master.wishlist:
                 output += "\n\n"
                 if str(item["BINUpdateTime"]) != "-1": # Make sure the user wants it to be checked
                                                         # Better safe than sorry with the Str stuff
-                    newCost = binSearch(item["Name"])
+                    newCost = prices[item["Name"]][1]
                     output += f"Got new BIN cost for {item['Name']} of {newCost}\n"
                     output += f"Old cost was {item['BINCost']}\n"
                     if item["BINCost"] - newCost > 0: # Positive = price went down
@@ -356,8 +236,7 @@ class MainWindow(tk.Frame):
                         difference = newCost - item['BINCost']
                     output += f"Difference: {verb} {difference} coins\n"
                         
-                    item["BINCost"] = newCost
-                    item["BINUpdateTime"] = time.asctime()
+                    self.master.wishlist.update(item, BINCost=newCost, BINUpdateTime=time.asctime()) # Moves it in the sorted lists
                     
                 else: output += f"Did not update BIN for {item['Name']}\n"
             PriceResultWindow(output, self.master)
@@ -366,44 +245,61 @@ class MainWindow(tk.Frame):
 
 
     def updateAH(self):
-        """Update the AH data stored in AHData.json"""
+        """Update the stored AH data, in the background"""
+        if not self.refresher.refreshNow():
+            self.messageStrVar.set("Already updating the Auction House!")
+            return
         self.messageStrVar.set("Updating Auction House (this may take a while)")
-        LoadWindow(self.master)
+        self.loadWindow = LoadWindow(self.master)
 
+    def _openLoadWindow(self):
+        """Returns the progress window, if the user hasn't closed it"""
+        if self.loadWindow is not None and self.loadWindow.winfo_exists(): return self.loadWindow
+        return None
+
+    def refreshProgress(self, pagesDone, totalPages):
+        self.messageStrVar.set(f"Updating Auction House: {pagesDone}/{totalPages}")
+        if self._openLoadWindow(): self.loadWindow.showProgress(pagesDone, totalPages)
+
+    def refreshDone(self, auctionCount):
         self.messageStrVar.set("Stored auction house data sucessfully")
+        if self._openLoadWindow(): self.loadWindow.finished(f"Stored {auctionCount} auctions")
+        self.loadWindow = None
         self.updateList()
 
+    def refreshFailed(self, error):
+        self.messageStrVar.set("Couldn't update the Auction House!")
+        if self._openLoadWindow(): self.loadWindow.finished(f"Download failed: {error}")
+        self.loadWindow = None
+
+    @profiler.profiled("save data")
     def saveUserData(self):
-        with open(f"userSaves/items{self.usernameStrVar.get()}.json","w") as f:
-                json.dump(self.master.itemList, f)
+        """Changes are saved by themselves, this just saves them right now"""
+        username = self.master.wishlist.username
+        if username is None:
+            self.messageStrVar.set("No user loaded. Please load a user first.")
+            return
+        self.store.save(username)
         self.messageStrVar.set("Saved data successfuly!")
 
+    @profiler.profiled("load data")
     def loadUserData(self):
         """Load the data for the username specified in
             the username entry"""
         if self.usernameStrVar.get() == "":
             self.messageStrVar.set("No username specified. Please enter a username.")
         else:
-            try:
-                with open(f"userSaves/items{self.usernameStrVar.get()}.json","r") as f:
-                    itemList = json.load(f)
-                    self.messageStrVar.set(f"Loaded itemlist for ID: {self.usernameStrVar.get()}")
-            
+            username = self.usernameStrVar.get()
+            itemList = self.store.load(username)
+            if itemList is not None:
+                self.messageStrVar.set(f"Loaded itemlist for ID: {username}")
 
-            except FileNotFoundError:
+            else:
                 self.messageStrVar.set("User not found. Created new.")
-                # Create a new user ID
-                itemList = [] 
-
-                with open(f"userSaves/items{self.usernameStrVar.get()}.json","w") as f: # Create a new items file for this user.
-                    json.dump([],f) # Just in case the user doesn't save, they don't need to create a new ID again 
+                # Create a new user ID. It's only saved once it has some items, so typos don't leave saves behind
+                itemList = self.store.create(username)
 
-            
-            try: 
-                itemList # This will raise an error if no actual list was loaded
-                self.master.itemList = itemList
-
-            except: self.messageStrVar.set("No valid item list was loaded.")
+            self.setWishlist(itemList, username)
         self.updateList()
 
 
@@ -482,12 +378,12 @@ class DeleteItemWindow(tk.Toplevel):
         self.statusLabel = tk.Label(self,textvariable=self.statusStrVar)
         self.statusLabel.grid(row=2,columnspan=2)
 
+    @profiler.profiled("delete item")
     def submitClicked(self):
         itemName = self.nameStrVar.get().lower()
-        for item in self.master.itemList:
+        for item in list(self.master.wishlist): # A copy, so removing items doesn't skip any
             if itemName in item["Name"].lower():
-                self.master.itemList.pop(self.master.itemList.index(item))
-                self.master.updateList()
+                self.master.wishlist.remove(item) # The list redraws itself
                 self.destroy()
 
         # If it makes it here the item wasn't found. Alert the user
@@ -555,6 +451,7 @@ class AddItemWindow(tk.Toplevel):
         self.cancelButton = tk.Button(self,text="Cancel",command=self.destroy)
         self.cancelButton.grid(row=5,column=1)
     
+    @profiler.profiled("add item")
     def submitClicked(self):
 
         if self.searchBINStrVar.get() == "Yes":
@@ -572,7 +469,7 @@ class AddItemWindow(tk.Toplevel):
         if BINPrice == 0: # Impossible, bad data
             BINPrice, BINUpdateTime = -1,-1
 
-        self.master.itemList.append({
+        self.master.wishlist.add({
                 "Name":self.nameStrVar.get(),
                 "Priority":int(self.priorityStrVar.get()),
                 "UserCost":int(self.costStrVar.get()),
@@ -580,14 +477,19 @@ class AddItemWindow(tk.Toplevel):
                 "AHUpdateTime":AHUpdateTime,
                 "BINCost":BINPrice,
                 "BINUpdateTime":BINUpdateTime
-                })
-        self.master.updateList()
+                }) # The list redraws itself
         self.destroy() # close the window
         
 
 
 if __name__ == "__main__": # as if it would never not be
-    
+    parser = argparse.ArgumentParser(description="Skyblock Purchase Organizer")
+    parser.add_argument("--profile", nargs="?", const="profile", metavar="FOLDER",
+                        help="Time everything you do, and write the results to FOLDER when you close the window")
+    parser.add_argument("--cprofile", action="store_true", help="With --profile, also cProfile every action")
+    args = parser.parse_args()
+    if args.profile: profiler.enable(args.profile, useCProfile=args.cprofile)
+
     root = tk.Tk()
     root.geometry('')
     app = MainWindow(root)
@@ -0,0 +1,141 @@
+#! python3
+
+# Finding which auctions have an item name containing a search term,
+# without lowercasing and checking every single auction name every search.
+
+# There are only a few thousand different item names on the auction house,
+# but hundreds of thousands of auctions, so everything here works on the
+# different names, then maps them back to the auctions.
+
+from collections import deque # Standard library modules
+
+
+def trigrams(text):
+    """Returns the set of every 3 character chunk of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex():
+    """
+    An index of the item names of a list of auctions.
+
+    Every different (lowercased) name gets a name id, and every trigram
+    maps to the ids of the names it appears in. A search only has to check
+    the names that contain every trigram of the search term.
+    """
+    def __init__(self, names, nameIds):
+        """
+        names is every different lowercased item name, indexed by name id,
+        and nameIds is the name id of every auction, in order
+        """
+        self.names = names
+        self.nameIds = nameIds
+        self._auctionsByName = None
+        self.postings = {} # trigram -> list of name ids that contain it
+        for nameId, name in enumerate(names):
+            for trigram in trigrams(name):
+                self.postings.setdefault(trigram, []).append(nameId)
+
+    @property
+    def auctionsByName(self):
+        """The auction indexes for each name id, in order. Only worked out if something needs it."""
+        if self._auctionsByName is None:
+            auctionsByName = [[] for name in self.names]
+            for auctionIndex, nameId in enumerate(self.nameIds):
+                auctionsByName[nameId].append(auctionIndex)
+            self._auctionsByName = auctionsByName
+        return self._auctionsByName
+
+    def matchingNames(self, query):
+        """
+        Returns the ids of every name that contains query (case insensitive),
+        the same as checking query.lower() in name.lower() for every name.
+        """
+        query = query.lower()
+        queryTrigrams = trigrams(query)
+        if not queryTrigrams: # Too short to have any trigrams, check every name
+            return [nameId for nameId, name in enumerate(self.names) if query in name]
+
+        postingLists = []
+        for trigram in queryTrigrams:
+            postingList = self.postings.get(trigram)
+            if postingList is None: return [] # Nothing has this trigram, so nothing matches
+            postingLists.append(postingList)
+        postingLists.sort(key=len) # Start with the rarest trigram
+
+        candidates = set(postingLists[0])
+        for postingList in postingLists[1:]:
+            candidates.intersection_update(postingList)
+            if not candidates: return []
+
+        # Having all the trigrams doesn't mean they are in the right order, so check for real
+        return sorted(nameId for nameId in candidates if query in self.names[nameId])
+
+    def matchingAuctions(self, query):
+        """
+        Returns the indexes of every auction whose name contains query,
+        in the same order as the auctions.
+        """
+        return self.auctionsForNames(self.matchingNames(query))
+
+    def auctionsForNames(self, nameIds):
+        """Returns the indexes of every auction with one of the name ids, in order"""
+        matches = []
+        for nameId in nameIds:
+            matches.extend(self.auctionsByName[nameId])
+        matches.sort() # Keep the original auction order, the searches rely on it for ties
+        return matches
+
+
+class MultiMatcher():
+    """
+    Finds which of a bunch of search terms appear in a piece of text,
+    all at once, in one pass over the text (Aho-Corasick).
+
+    Terms are lowercased, and so should the text be.
+    """
+    def __init__(self, terms):
+        self.terms = [term.lower() for term in terms]
+        self.goto = [{}] # node -> {character: next node}
+        self.fail = [0] # node -> node to fall back to when there's no next character
+        self.output = [[]] # node -> ids of the terms that end at this node
+        self.emptyTerms = [] # Terms that are "", which are in everything
+
+        for termId, term in enumerate(self.terms):
+            if not term:
+                self.emptyTerms.append(termId)
+                continue
+            node = 0
+            for character in term:
+                nextNode = self.goto[node].get(character)
+                if nextNode is None:
+                    nextNode = self.goto[node][character] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = nextNode
+            self.output[node].append(termId)
+
+        # Work out the fail links breadth first, so the shorter ones are always done first
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for character, nextNode in self.goto[node].items():
+                queue.append(nextNode)
+                fallback = self.fail[node]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nextNode] = self.goto[fallback].get(character, 0)
+                self.output[nextNode] = self.output[nextNode] + self.output[self.fail[nextNode]]
+
+    def findIn(self, text):
+        """Returns the sorted ids of every term that appears in text"""
+        found = set(self.emptyTerms)
+        node = 0
+        goto, fail, output = self.goto, self.fail, self.output
+        for character in text:
+            while node and character not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(character, 0)
+            if output[node]: found.update(output[node])
+        return sorted(found)
@@ -0,0 +1,174 @@
+#! python3
+
+# The organizer without any windows or questions, for running from
+# cron or scripts on a server. Nothing in here (or anything it imports)
+# uses tkinter.
+
+# Examples:
+#   python organizerCli.py refresh
+#   python organizerCli.py reprice --all --output changes.json
+#   python organizerCli.py reprice Steve Alex --format csv
+#   python organizerCli.py report --all --format csv --output report.csv
+#   python organizerCli.py archive 20240101-120000-1704110400000 --output old.ndjson
+
+import sys, csv, json, time, argparse # Standard library modules
+
+import config # The config file
+from auctionData import ingestAH, LAST_UPDATE_PATH # The stored AH data
+from userData import loadUserItems, saveUserItems, listUsers # Loading and saving item lists
+from pricing import priceItems, repriceItems # Price estimates from the AH data
+import profiler # Timing for --profile
+import ahArchive # Old AH snapshots
+import priceHistory # Every item's price over time
+
+
+ITEM_FIELDS = ["Name", "Priority", "UserCost", "AHCost", "AHUpdateTime", "BINCost", "BINUpdateTime"]
+
+
+def log(message):
+    """Progress goes to stderr, so stdout is only ever the actual output"""
+    print(message, file=sys.stderr)
+
+
+def lastAHUpdate():
+    try:
+        with open(LAST_UPDATE_PATH, "r") as f:
+            return f.read()
+    except FileNotFoundError: return None
+
+
+def pickUsers(args):
+    """Returns the users asked for on the command line"""
+    users = listUsers() if args.all else args.users
+    if not users: sys.exit("No users given. Name some users, or use --all")
+    return users
+
+
+def loadUsers(users):
+    """Returns {user: item list}, leaving out (and warning about) users that don't exist"""
+    itemLists = {}
+    for user in users:
+        itemList = loadUserItems(user)
+        if itemList is None: log(f"No saved items for {user}, skipping")
+        else: itemLists[user] = itemList
+    return itemLists
+
+
+def writeOutput(args, rows, fields, document):
+    """Writes rows (a list of dicts) as csv, or document as json"""
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(document, out, indent=2)
+            out.write("\n")
+    finally:
+        if out is not sys.stdout: out.close()
+
+
+def refreshCommand(args):
+    start = time.perf_counter()
+    count = ingestAH(progress=lambda pagesDone, totalPages: log(f"Got page {pagesDone} of {totalPages}"),
+                     workers=args.workers)
+    log(f"Stored {count} auctions in {time.perf_counter() - start:.1f}s")
+
+
+def repriceCommand(args):
+    itemLists = loadUsers(pickUsers(args))
+    allNames = [item["Name"] for itemList in itemLists.values() for item in itemList]
+    prices = priceItems(allNames) # Every user's items, in one go
+
+    changes = []
+    for user, itemList in itemLists.items():
+        for item, kind, oldCost, newCost in repriceItems(itemList, prices, updateAH=not args.bin_only, updateBIN=not args.ah_only):
+            changes.append({"User": user, "Name": item["Name"], "Kind": kind, "OldCost": oldCost, "NewCost": newCost})
+        if not args.dry_run: saveUserItems(user, itemList)
+
+    log(f"Repriced {len(changes)} prices for {len(itemLists)} users")
+    writeOutput(args, changes, ["User", "Name", "Kind", "OldCost", "NewCost"],
+                {"ahLastUpdate": lastAHUpdate(), "generated": time.asctime(), "changes": changes})
+
+
+def reportCommand(args):
+    itemLists = loadUsers(pickUsers(args))
+    rows = [dict(item, User=user) for user, itemList in itemLists.items() for item in itemList]
+    writeOutput(args, rows, ["User"] + ITEM_FIELDS,
+                {"ahLastUpdate": lastAHUpdate(), "generated": time.asctime(), "users": itemLists})
+
+
+def archiveCommand(args):
+    if args.snapshot is None:
+        for name in ahArchive.listSnapshots():
+            info = ahArchive.snapshotInfo(name)
+            print(f"{name}  {info['auctions']} auctions, archived {info['archived']}")
+        return
+    if args.snapshot not in ahArchive.listSnapshots(): sys.exit(f"No archived snapshot called {args.snapshot}")
+    if args.output: ahArchive.restoreSnapshot(args.snapshot, args.output)
+    else:
+        for line in ahArchive.iterSnapshotLines(args.snapshot):
+            sys.stdout.buffer.write(line + b"\n")
+
+
+def historyCommand(args):
+    end = time.time()
+    points = priceHistory.history(args.item, args.kind, start=end - args.days * 86400, end=end)
+    rows = [{"Time": time.strftime("%Y-%m-%d %H:%M", time.localtime(start)), "Average": average,
+             "Lowest": lowest, "Highest": highest, "Latest": latest}
+            for start, average, lowest, highest, latest in points]
+    writeOutput(args, rows, ["Time", "Average", "Lowest", "Highest", "Latest"],
+                {"item": args.item, "kind": args.kind, "points": rows})
+
+
+def makeParser():
+    parser = argparse.ArgumentParser(description="Skyblock Purchase Organizer, without the windows")
+    parser.add_argument("--profile", metavar="FOLDER", help="Time the command, and write the results to FOLDER")
+    parser.add_argument("--cprofile", action="store_true", help="With --profile, also cProfile the command")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    refresh = commands.add_parser("refresh", help="Download new AH data")
+    refresh.add_argument("--workers", type=int, default=config.downloadWorkers, help="Pages to download at once")
+    refresh.set_defaults(run=refreshCommand)
+
+    def addUserArguments(command):
+        command.add_argument("users", nargs="*", help="The users to use")
+        command.add_argument("--all", action="store_true", help="Use every saved user")
+        command.add_argument("--format", choices=["json", "csv"], default="json")
+        command.add_argument("--output", help="File to write to, instead of printing it")
+
+    reprice = commands.add_parser("reprice", help="Update users' AH and BIN prices from the stored AH data")
+    addUserArguments(reprice)
+    reprice.add_argument("--ah-only", action="store_true", help="Only update AH prices")
+    reprice.add_argument("--bin-only", action="store_true", help="Only update BIN prices")
+    reprice.add_argument("--dry-run", action="store_true", help="Work out the new prices, but don't save them")
+    reprice.set_defaults(run=repriceCommand)
+
+    report = commands.add_parser("report", help="Print users' item lists")
+    addUserArguments(report)
+    report.set_defaults(run=reportCommand)
+
+    history = commands.add_parser("history", help="Print the price history of an item (see config.recordPriceHistory)")
+    history.add_argument("item", help="The item's exact name")
+    history.add_argument("--kind", choices=["ah", "bin"], default="bin")
+    history.add_argument("--days", type=float, default=1, help="How far back to go")
+    history.add_argument("--format", choices=["json", "csv"], default="json")
+    history.add_argument("--output", help="File to write to, instead of printing it")
+    history.set_defaults(run=historyCommand)
+
+    archive = commands.add_parser("archive", help="List the archived AH snapshots, or get one back (see config.archiveSnapshots)")
+    archive.add_argument("snapshot", nargs="?", help="The snapshot to write out as ndjson, leave out to list them")
+    archive.add_argument("--output", help="File to write to, instead of printing it")
+    archive.set_defaults(run=archiveCommand)
+    return parser
+
+
+def main(argv=None):
+    args = makeParser().parse_args(argv)
+    if args.profile: profiler.enable(args.profile, useCProfile=args.cprofile)
+    with profiler.span(args.command):
+        args.run(args)
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,118 @@
+#! python3
+
+# Works out prices for lots of items at once using every core, for huge
+# auction houses (when config.pricingWorkers is more than 0).
+
+# The snapshot file is split into one shard of auctions per worker process.
+# Nothing big gets copied to the workers: each one memory maps the snapshot
+# file itself (see snapshotFile.py), so they all share the OS's one copy.
+# All they get sent is which search terms are in each name id (worked out
+# once, by the parent), and which auctions are theirs.
+
+# Each worker keeps the best <num> auctions of its shard for every term, and
+# sends back (key, auction number, price) for those. The best <num> of the
+# whole market are always in the best <num> of the shards, so the parent just
+# merges the short lists. Ties go to the earliest auction, same as everywhere else,
+# so the prices are exactly what pricing.ahSearch() and pricing.binSearch() give.
+
+import os, heapq, threading # Standard library modules
+
+import profiler # Timing for --profile
+from topKIndex import keepBest # The one pass over the auctions
+
+
+_pool = None # Started the first time it's needed, and kept for next time
+_poolWorkers = 0
+_poolLock = threading.Lock()
+
+
+def _getPool(workers):
+    global _pool, _poolWorkers
+    with _poolLock:
+        if _pool is None or _poolWorkers != workers:
+            if _pool is not None: _pool.shutdown(wait=False)
+            import multiprocessing # Only imported if the workers are actually used
+            from concurrent.futures import ProcessPoolExecutor
+            # Spawn, not fork: forking a program with tk and other threads running isn't safe
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+            _poolWorkers = workers
+        return _pool
+
+
+def _resetPool():
+    """Forgets the pool, after a worker died, so the next call starts a new one"""
+    global _pool
+    with _poolLock:
+        if _pool is not None: _pool.shutdown(wait=False)
+        _pool = None
+
+
+_snapshotFile = None # In each worker, the last snapshot file it used, so the file is only mapped once
+
+
+def _openSnapshot(path, stamp):
+    """Returns the snapshot file at path in a worker, or None if it isn't the one the parent has (stamp)"""
+    global _snapshotFile
+    if _snapshotFile is None or _snapshotFile.path != path or _snapshotFile.stamp != stamp:
+        from snapshotFile import SnapshotFile
+        _snapshotFile = None # Let go of the old one, so it can be deleted
+        try: snapshotFile = SnapshotFile(path)
+        except FileNotFoundError: return None # There's a newer one now
+        if snapshotFile.stamp != stamp: return None
+        _snapshotFile = snapshotFile
+    return _snapshotFile
+
+
+def _priceShard(path, stamp, start, stop, termsByName, ahNum, binNum):
+    """
+    Runs in a worker. Returns the best auctions out of auctions start to stop for each term,
+    as two dictionaries (AH and BIN) of term -> [(key, auction number, price), ...],
+    or None if the snapshot file has changed.
+    """
+    snapshotFile = _openSnapshot(path, stamp)
+    if snapshotFile is None: return None
+
+    # Same as the one pass in pricing._priceQueries(), just over less auctions
+    ahHeaps = {}
+    binHeaps = {}
+    rows = zip(snapshotFile.nameIds[start:stop], snapshotFile.isBin[start:stop], snapshotFile.end[start:stop],
+               snapshotFile.startingBid[start:stop], snapshotFile.highestBid[start:stop])
+    keepBest(ahHeaps, binHeaps, ahNum, binNum, rows, start, termsByName)
+
+    def unNegate(heaps):
+        return {term: [(-key, -index, price) for key, index, price in heap] for term, heap in heaps.items()}
+    return unNegate(ahHeaps), unNegate(binHeaps)
+
+
+def priceQueries(snapshotPath, stamp, auctionCount, termsByName, termCount, ahNum, binNum, workers):
+    """
+    Works out the AH and BIN price of termCount search terms over the snapshot
+    file at snapshotPath, split between <workers> processes. stamp is the
+    (modified time, size) of the snapshot file the name ids are from, and
+    termsByName is the terms in each name id (like nameSearch.MultiMatcher.findIn() gives).
+
+    Returns a list of (AH price, BIN price) for each term, or None if it
+    couldn't be done (the file changed, or a worker died), so do it without the workers.
+    """
+    from concurrent.futures.process import BrokenProcessPool
+    snapshotPath = os.path.abspath(snapshotPath) # The workers might not be in the same folder any more
+    shardSize = max(1, -(-auctionCount // workers)) # Rounded up, so there are never more shards than workers
+    try:
+        with profiler.span("price shards"):
+            pool = _getPool(workers)
+            shards = [pool.submit(_priceShard, snapshotPath, stamp, start, min(start + shardSize, auctionCount),
+                                  termsByName, ahNum, binNum) for start in range(0, auctionCount, shardSize)]
+            results = [shard.result() for shard in shards]
+    except BrokenProcessPool:
+        _resetPool()
+        return None
+    if any(result is None for result in results): return None
+
+    with profiler.span("merge shards"):
+        prices = []
+        for term in range(termCount):
+            bestAH = heapq.nsmallest(ahNum, (entry for ahBest, binBest in results for entry in ahBest.get(term, ())))
+            bestBIN = heapq.nsmallest(binNum, (entry for ahBest, binBest in results for entry in binBest.get(term, ())))
+            prices.append((sum(entry[2] for entry in bestAH) // ahNum,
+                           sum(entry[2] for entry in bestBIN) // binNum)) # The averages
+        return prices
@@ -0,0 +1,136 @@
+#! python3
+
+# The AH and BIN price of every item, every time the AH data is updated,
+# kept in auctionHouse/priceHistory.db.
+
+# Storing every price from every update would get huge, and looking at a year
+# of it would mean reading thousands of points. So prices are added straight
+# into per minute, per hour and per day buckets (count, total, lowest, highest
+# and latest) as they come in, and the fine buckets are thrown away after a while.
+# A year of one item is then about 365 day buckets, no matter how often the AH updated.
+
+import os, time, threading # Standard library modules
+
+import config # The config file
+import sqliteStore # The SQLite version of the AH data (for the item names)
+
+
+HISTORY_PATH = os.path.join("auctionHouse", "priceHistory.db")
+
+# (bucket size in seconds, how long to keep buckets that size for in seconds, None = forever)
+RESOLUTIONS = [
+    (60, 2 * 86400), # Minutes, for 2 days
+    (3600, 90 * 86400), # Hours, for 90 days
+    (86400, None), # Days, forever
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE -- lowercased item_name
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    name_id INTEGER NOT NULL,
+    kind TEXT NOT NULL, -- "ah" or "bin"
+    resolution INTEGER NOT NULL, -- Bucket size in seconds
+    start INTEGER NOT NULL, -- Unix time the bucket starts at
+    count INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    lowest INTEGER NOT NULL,
+    highest INTEGER NOT NULL,
+    latest INTEGER NOT NULL,
+    PRIMARY KEY (name_id, kind, resolution, start)
+) WITHOUT ROWID;
+-- So throwing out old buckets doesn't have to look through every name's buckets
+CREATE INDEX IF NOT EXISTS buckets_by_age ON buckets (resolution, start);
+CREATE TABLE IF NOT EXISTS recorded (
+    time INTEGER PRIMARY KEY -- Every update that's been added, so none get added twice
+);
+"""
+
+_local = threading.local() # sqlite connections can't be shared between threads
+
+
+def connect(path=None):
+    """Returns this thread's connection to the history database, making the tables if needed"""
+    if path is None: path = HISTORY_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None: connections = _local.connections = {}
+    if path not in connections:
+        import sqlite3 # Only imported if the history is actually used
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL") # Reading the history can keep going while an update is added
+        connection.executescript(SCHEMA)
+        connections[path] = connection
+    return connections[path]
+
+
+def itemNames():
+    """Returns every different (lowercased) item name in the stored AH data"""
+    if config.storageBackend == "sqlite":
+        return [row[0] for row in sqliteStore.connect().execute("SELECT name FROM names")]
+    from auctionData import getSnapshot # Imported here, auctionData imports this
+    return list(getSnapshot().nameIndex.names)
+
+
+def recordPrices(when=None, path=None):
+    """
+    Works out the AH and BIN price of every item in the stored AH data
+    (the same as ahSearch() and binSearch() would give) and adds them to the history.
+    when is the unix time of the data, now if not given. Does nothing if
+    that time has already been recorded. Returns the number of items recorded.
+    """
+    from pricing import priceItems # Imported here, pricing imports auctionData which imports this
+    if when is None: when = time.time()
+    when = int(when)
+    connection = connect(path)
+    if connection.execute("SELECT 1 FROM recorded WHERE time = ?", (when,)).fetchone() is not None: return 0
+
+    names = itemNames()
+    prices = priceItems(names, cache=False) # Don't push everything the user looked up out of the cache
+    with connection: # All of it or none of it
+        connection.execute("INSERT INTO recorded VALUES (?)", (when,))
+        connection.executemany("INSERT OR IGNORE INTO names (name) VALUES (?)", ((name,) for name in names))
+        nameIds = dict(connection.execute("SELECT name, id FROM names"))
+        rows = []
+        for name, (ahPrice, binPrice) in prices.items():
+            for kind, price in (("ah", ahPrice), ("bin", binPrice)):
+                if price <= 0: continue # No auctions of that kind right now
+                for resolution, keepFor in RESOLUTIONS:
+                    rows.append((nameIds[name], kind, resolution, when - when % resolution, price, price, price, price))
+        # Add to the bucket if it's already there, otherwise start it
+        connection.executemany("""
+            INSERT INTO buckets VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)
+            ON CONFLICT (name_id, kind, resolution, start) DO UPDATE SET
+                count = count + 1, total = total + excluded.total, latest = excluded.latest,
+                lowest = min(lowest, excluded.lowest), highest = max(highest, excluded.highest)""", rows)
+        for resolution, keepFor in RESOLUTIONS: # Throw out buckets that are too old to keep
+            if keepFor is not None:
+                connection.execute("DELETE FROM buckets WHERE resolution = ? AND start < ?", (resolution, when - keepFor))
+    return len(prices)
+
+
+def history(item, kind="bin", start=None, end=None, maxPoints=500, path=None):
+    """
+    Returns the price history of one item (its exact name, any case) between
+    the unix times start and end (the last day, and now, if not given), as a list of
+        (bucket start time, average, lowest, highest, latest)
+    using the finest buckets that are still kept that far back, and that fit in maxPoints.
+    """
+    if end is None: end = time.time()
+    if start is None: start = end - 86400
+    connection = connect(path)
+    row = connection.execute("SELECT id FROM names WHERE name = ?", (item.lower(),)).fetchone()
+    if row is None: return []
+
+    for resolution, keepFor in RESOLUTIONS:
+        keptBackTo = None if keepFor is None else time.time() - keepFor
+        if (keptBackTo is None or start >= keptBackTo) and (end - start) / resolution <= maxPoints: break
+    # (If nothing fits, this ends up being the last, coarsest, resolution)
+
+    return [(bucketStart, total // count, lowest, highest, latest) for bucketStart, count, total, lowest, highest, latest
+            in connection.execute("""
+                SELECT start, count, total, lowest, highest, latest FROM buckets
+                WHERE name_id = ? AND kind = ? AND resolution = ? AND start >= ? AND start <= ?
+                ORDER BY start""", (row[0], kind, resolution, start - start % resolution, end))]
@@ -0,0 +1,311 @@
+#! python3
+
+# Works out item prices from the stored auction house data.
+# These used to be copy pasted into every version of the program.
+
+# The AH price of an item is the average highest bid of the config.ahNum
+# regular auctions closest to ending, and the BIN price is the average of the
+# config.binNum cheapest BIN auctions. "Matching" means the search term is
+# somewhere in the item name, ignoring case.
+
+import time, heapq, threading # Standard library modules
+from collections import OrderedDict
+
+import config # The config file
+from auctionData import getSnapshot, snapshotVersion, loadNumpy # The stored AH data
+from nameSearch import MultiMatcher # Searching for lots of items at once
+from topKIndex import TopK, keepBest # The best auctions of each name
+import sqliteStore # The SQLite version of the AH data
+import profiler # Timing for --profile
+import parallelPricing # Using every core for huge auction houses
+
+
+class PriceCache():
+    """
+    Remembers price estimates, so asking for the same price twice
+    doesn't search twice. Only holds prices for one version of the
+    AH data, everything is forgotten as soon as the data changes.
+    When it's full, the least recently used price is dropped.
+    """
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.version = None # The version of the AH data the prices are for
+        self.prices = OrderedDict() # (search term, "ah" or "bin", ahNum or binNum) -> price
+        self.lock = threading.Lock()
+
+    def lookup(self, version, key):
+        """Returns the remembered price for key, or None"""
+        with self.lock:
+            if version != self.version: return None
+            price = self.prices.get(key)
+            if price is not None: self.prices.move_to_end(key) # Used just now
+            return price
+
+    def store(self, version, key, price):
+        with self.lock:
+            if version != self.version: # New AH data, all the old prices are useless
+                self.prices.clear()
+                self.version = version
+            self.prices[key] = price
+            self.prices.move_to_end(key)
+            while len(self.prices) > self.maxSize:
+                self.prices.popitem(last=False) # Drop the least recently used
+
+
+_priceCache = PriceCache(config.priceCacheSize)
+
+
+def _dataVersion():
+    """Returns something that changes whenever new AH data is stored"""
+    if config.storageBackend == "sqlite": return ("sqlite", snapshotVersion()) # The last update file changes every time
+    return getSnapshot().version
+
+
+def _cached(kind, num, item, search):
+    """Returns the cached price, or works it out with search(item) and remembers it"""
+    version = _dataVersion()
+    key = (item.lower(), kind, num)
+    price = _priceCache.lookup(version, key)
+    if price is None:
+        price = search(item)
+        _priceCache.store(version, key, price)
+    return price
+
+
+def ahSearch(item):
+    """
+    Searches the stored Auction House data for an item,
+    and returns the average of the config.ahNum auctions
+    closest to ending. Returns an integer price.
+    """
+    return _cached("ah", config.ahNum, item, _ahSearch)
+
+
+def binSearch(item):
+    """
+    Searches the stored BIN catagoty of the Auction 
+    House data for an item, and returns the average
+    of the config.binNum lowest prices. Returns an
+    integer price.
+    """
+    return _cached("bin", config.binNum, item, _binSearch)
+
+
+
+@profiler.profiled("ahSearch")
+def _ahSearch(item):
+    """ahSearch(), without the cache"""
+    if config.storageBackend == "sqlite": return sqliteStore.ahSearch(item)
+    snapshot = getSnapshot() # Only read from disk once, not every search
+    nameIds = snapshot.nameIndex.matchingNames(item)
+    return _average(snapshot, nameIds, False, config.ahNum)
+
+
+
+@profiler.profiled("binSearch")
+def _binSearch(item):
+    """binSearch(), without the cache"""
+    if config.storageBackend == "sqlite": return sqliteStore.binSearch(item)
+    snapshot = getSnapshot() # Only read from disk once, not every search
+    nameIds = snapshot.nameIndex.matchingNames(item)
+    return _average(snapshot, nameIds, True, config.binNum)
+
+
+
+def _columns(snapshot, wantBin):
+    """
+    Returns the column to pick the best auctions by,
+    and the column to average, for AH or BIN
+    """
+    if wantBin: return snapshot.startingBid, snapshot.startingBid # Cheapest BINs
+    return snapshot.end, snapshot.highestBid # Closest to ending
+
+
+def _average(snapshot, nameIds, wantBin, num):
+    """
+    Returns the average price of the <num> best auctions
+    with one of the name ids, either BIN or not.
+    """
+    topK = snapshot.topK
+    if topK is not None and topK.canAnswer(wantBin, num): # Already worked out when the data was stored
+        return topK.average(nameIds, wantBin, num)
+    if snapshot.vectorized: return _vectorAverage(snapshot, nameIds, wantBin, num)
+
+    keyColumn, priceColumn = _columns(snapshot, wantBin)
+    isBin = snapshot.isBin
+    matchedAuctions = (auctionIndex for auctionIndex in snapshot.nameIndex.auctionsForNames(nameIds)
+                       if isBin[auctionIndex] == wantBin)
+
+    # nsmallest only ever keeps <num> auctions around instead of sorting the whole lot,
+    # but gives the same thing as sorting and taking the first <num> (ties included)
+    bestAuctions = heapq.nsmallest(num, matchedAuctions, key=keyColumn.__getitem__)
+
+    price = 0
+    for auctionIndex in bestAuctions:
+        price += priceColumn[auctionIndex]
+
+    return price // num # Return the average
+
+
+def _vectorAverage(snapshot, nameIds, wantBin, num):
+    """The same as _average(), but using numpy to do the whole column at once"""
+    numpy = loadNumpy()
+    keyColumn, priceColumn = _columns(snapshot, wantBin)
+
+    wantedNames = numpy.zeros(len(snapshot.nameIndex.names), dtype=numpy.bool_)
+    wantedNames[nameIds] = True
+    matchedAuctions = numpy.flatnonzero(wantedNames[snapshot.nameIdColumn] & (snapshot.isBin == wantBin))
+
+    if len(matchedAuctions) > num:
+        keys = keyColumn[matchedAuctions]
+        cutoff = numpy.partition(keys, num - 1)[num - 1] # The <num>th best key, without sorting
+        better = matchedAuctions[keys < cutoff]
+        # Ties at the cutoff go to the earliest auctions, same as a (stable) sort would
+        tied = matchedAuctions[keys == cutoff][:num - len(better)]
+        matchedAuctions = numpy.concatenate((better, tied))
+
+    return int(priceColumn[matchedAuctions].sum()) // num # Return the average
+
+
+
+_vectorTopKCache = (None, None) # (snapshot, TopK), so it's only worked out once per snapshot
+
+
+@profiler.profiled("build top k")
+def _vectorTopK(snapshot, ahNum, binNum):
+    """
+    Works out the best <ahNum> regular auctions and <binNum> BINs of every name
+    with numpy, the same as topKIndex.TopKBuilder would, for when there's no
+    AHTopK.json that can answer. A few sorts of the whole market, instead of
+    masking the whole market once per search term.
+    """
+    global _vectorTopKCache
+    cachedSnapshot, topK = _vectorTopKCache
+    if cachedSnapshot is snapshot and topK.canAnswer(False, ahNum) and topK.canAnswer(True, binNum): return topK
+
+    numpy = loadNumpy()
+    nameCount = len(snapshot.nameIndex.names)
+    data = {"ahNum": ahNum, "binNum": binNum}
+    for kind, wantBin, num in (("ah", False, ahNum), ("bin", True, binNum)):
+        keyColumn, priceColumn = _columns(snapshot, wantBin)
+        rows = numpy.flatnonzero(snapshot.isBin == wantBin)
+        nameIds = snapshot.nameIdColumn[rows]
+        # By name, then best first. lexsort is stable and rows are in order, so ties stay in auction order
+        order = numpy.lexsort((keyColumn[rows], nameIds))
+        rows, nameIds = rows[order], nameIds[order]
+        nameStarts = numpy.searchsorted(nameIds, numpy.arange(nameCount)) # Where each name's auctions start
+        best = (numpy.arange(len(rows)) - nameStarts[nameIds]) < num # The first <num> of each name
+        rows, nameIds = rows[best], nameIds[best]
+
+        bestByName = [[] for nameId in range(nameCount)]
+        for nameId, key, row, price in zip(nameIds.tolist(), keyColumn[rows].tolist(), rows.tolist(), priceColumn[rows].tolist()):
+            bestByName[nameId].append([key, row, price])
+        data[kind] = bestByName
+
+    topK = TopK(data)
+    _vectorTopKCache = (snapshot, topK)
+    return topK
+
+
+
+@profiler.profiled("priceItems")
+def priceItems(items, cache=True):
+    """
+    Works out the AH and BIN price of a whole list of items at once,
+    in one pass over the stored auctions, instead of one pass per item.
+
+    Returns a dictionary of item -> (AH price, BIN price), where the prices
+    are exactly what ahSearch(item) and binSearch(item) would give.
+    If cache is False, the prices aren't looked up in or added to the cache.
+    """
+    if not cache:
+        prices = _priceQueries(list(dict.fromkeys(item.lower() for item in items)))
+        return {item: prices[item.lower()] for item in items}
+    version = _dataVersion()
+    prices = {}
+    missing = [] # The search terms that aren't cached yet
+    for query in dict.fromkeys(item.lower() for item in items): # Every different search term
+        ahPrice = _priceCache.lookup(version, (query, "ah", config.ahNum))
+        binPrice = _priceCache.lookup(version, (query, "bin", config.binNum))
+        if ahPrice is None or binPrice is None: missing.append(query)
+        else: prices[query] = (ahPrice, binPrice)
+
+    if missing:
+        newPrices = _priceQueries(missing)
+        for query, (ahPrice, binPrice) in newPrices.items():
+            _priceCache.store(version, (query, "ah", config.ahNum), ahPrice)
+            _priceCache.store(version, (query, "bin", config.binNum), binPrice)
+        prices.update(newPrices)
+    return {item: prices[item.lower()] for item in items}
+
+
+def _priceQueries(queries):
+    """
+    priceItems(), without the cache. queries have to be lowercase and all different.
+    Returns a dictionary of query -> (AH price, BIN price)
+    """
+    if config.storageBackend == "sqlite": # Each search is already just an indexed query
+        return {query: (sqliteStore.ahSearch(query), sqliteStore.binSearch(query)) for query in queries}
+
+    snapshot = getSnapshot() # Only read from disk once, not every search
+    nameIndex = snapshot.nameIndex
+    matcher = MultiMatcher(queries)
+
+    # Find which search terms are in each different auction name. There are way fewer
+    # different names than auctions, so this is the cheap part.
+    with profiler.span("match names"):
+        termsByName = [matcher.findIn(name) for name in nameIndex.names]
+
+    topK = snapshot.topK
+    if topK is None or not (topK.canAnswer(False, config.ahNum) and topK.canAnswer(True, config.binNum)):
+        # No top k file that can answer, but numpy can work one out in a few sorts
+        topK = _vectorTopK(snapshot, config.ahNum, config.binNum) if snapshot.vectorized else None
+
+    # With the best auctions of each name, each term is just merging a few short lists
+    if topK is not None:
+        namesByTerm = [[] for query in queries]
+        for nameId, terms in enumerate(termsByName):
+            for term in terms: namesByTerm[term].append(nameId)
+        with profiler.span("pick best auctions"):
+            return {query: (topK.average(nameIds, False, config.ahNum), topK.average(nameIds, True, config.binNum))
+                    for query, nameIds in zip(queries, namesByTerm)}
+
+    # Otherwise every auction has to be looked at, so split them between the workers
+    if config.pricingWorkers > 0 and len(snapshot) >= config.parallelMinAuctions:
+        prices = parallelPricing.priceQueries(snapshot.file.path, snapshot.file.stamp, len(snapshot), termsByName,
+                                              len(queries), config.ahNum, config.binNum, config.pricingWorkers)
+        if prices is not None: return dict(zip(queries, prices))
+        # Otherwise the file changed under us or a worker died, so just do it here
+
+    # Now one pass over the auctions, keeping the best <num> auctions for each term
+    with profiler.span("pick best auctions"):
+        ahHeaps = {}
+        binHeaps = {}
+        rows = zip(nameIndex.nameIds, snapshot.isBin, snapshot.end, snapshot.startingBid, snapshot.highestBid)
+        keepBest(ahHeaps, binHeaps, config.ahNum, config.binNum, rows, 0, termsByName)
+
+    prices = {}
+    for term, query in enumerate(queries):
+        prices[query] = (sum(entry[2] for entry in ahHeaps.get(term, ())) // config.ahNum,
+                         sum(entry[2] for entry in binHeaps.get(term, ())) // config.binNum) # Return the averages
+    return prices
+
+
+
+def repriceItems(itemList, prices, updateAH=True, updateBIN=True):
+    """
+    Puts new prices (from priceItems()) into an item list, skipping
+    the prices the user turned off (update time of -1), like the
+    "Update AH Prices" and "Update BIN Prices" buttons do.
+
+    Returns a list of (item, "AH" or "BIN", old cost, new cost) for every price changed.
+    """
+    changes = []
+    for item in itemList:
+        for kind, wanted, priceIndex in (("AH", updateAH, 0), ("BIN", updateBIN, 1)):
+            if not wanted or str(item[f"{kind}UpdateTime"]) == "-1": continue # Better safe than sorry with the Str stuff
+            newCost = prices[item["Name"]][priceIndex]
+            changes.append((item, kind, item[f"{kind}Cost"], newCost))
+            item[f"{kind}Cost"] = newCost
+            item[f"{kind}UpdateTime"] = time.asctime()
+    return changes
@@ -0,0 +1,136 @@
+#! python3
+
+# Optional timing of everything the user does, turned on with --profile.
+# Each action (loading data, adding an item, repricing, downloading...) is a
+# named span, and the slow bits inside it are smaller spans, so you can tell
+# whether the time goes to loading, matching, sorting or drawing.
+
+# When it's done it writes, into the profile folder:
+#   profile-summary.json   count, total, mean, max and self time of every span
+#   profile.collapsed      "action;inner span;... microseconds" lines, which
+#                          flamegraph.pl, speedscope and friends can read
+#   <action>-<n>.prof      a cProfile of each action, if cProfile was turned on
+#                          (open with snakeviz, or python -m pstats)
+
+# When profiling is off, span() does nothing, so it's fine to leave it everywhere.
+
+import os, json, time, atexit, threading, functools, contextlib # Standard library modules
+
+
+_enabled = False
+_outputDir = None
+_useCProfile = False
+
+_stats = {} # (span, inner span, ...) -> [count, total seconds, max seconds, self seconds]
+_statsLock = threading.Lock()
+_actionCounts = {} # How many .prof files each action has written
+_cProfileBusy = False # Only one cProfile can run at a time in the whole process, even on different threads
+_local = threading.local() # Each thread has its own stack of open spans
+_nothing = contextlib.nullcontext()
+
+
+def enable(outputDir="profile", useCProfile=False):
+    """Turns on profiling, the results are written to outputDir when the program exits"""
+    global _enabled, _outputDir, _useCProfile
+    _enabled, _outputDir, _useCProfile = True, outputDir, useCProfile
+    os.makedirs(outputDir, exist_ok=True)
+    atexit.register(writeReport)
+
+
+def isEnabled():
+    return _enabled
+
+
+def span(name):
+    """
+    Times the code in a with block:
+        with profiler.span("reprice"):
+            ...
+    """
+    if not _enabled: return _nothing
+    return _Span(name)
+
+
+def profiled(name):
+    """The same as span(), but as a decorator for a whole function"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Span():
+    def __init__(self, name):
+        self.name = name
+        self.profile = None
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None: stack = _local.stack = []
+        if not stack and _useCProfile: # Only the outermost span gets a cProfile, they can't nest
+            self.profile = _startCProfile()
+        self.childTime = 0
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global _cProfileBusy
+        elapsed = time.perf_counter() - self.start
+        stack = _local.stack
+        stack.pop()
+        if stack: stack[-1].childTime += elapsed
+        path = tuple(span.name for span in stack) + (self.name,)
+
+        with _statsLock:
+            stats = _stats.setdefault(path, [0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += elapsed - self.childTime
+            if self.profile is not None:
+                self.profile.disable()
+                _cProfileBusy = False
+                number = _actionCounts[self.name] = _actionCounts.get(self.name, 0) + 1
+                fileName = "".join(c if c.isalnum() else "_" for c in self.name)
+                self.profile.dump_stats(os.path.join(_outputDir, f"{fileName}-{number}.prof"))
+        return False
+
+
+def _startCProfile():
+    """
+    Returns a running cProfile, or None if one is already running (an action
+    on another thread, like a background AH download), which gets this action too
+    """
+    global _cProfileBusy
+    with _statsLock:
+        if _cProfileBusy: return None
+        _cProfileBusy = True
+    import cProfile
+    profile = cProfile.Profile()
+    try: profile.enable()
+    except ValueError: # Something else is profiling (python 3.12+ only allows one)
+        with _statsLock: _cProfileBusy = False
+        return None
+    return profile
+
+
+def writeReport():
+    """Writes the summary and collapsed stacks. Called by itself when the program exits."""
+    if not _enabled: return
+    with _statsLock:
+        stats = sorted(_stats.items())
+
+    summary = {}
+    for path, (count, total, longest, selfTime) in stats:
+        summary[";".join(path)] = {"count": count, "totalSeconds": round(total, 6), "meanSeconds": round(total / count, 6),
+                                   "maxSeconds": round(longest, 6), "selfSeconds": round(selfTime, 6)}
+    with open(os.path.join(_outputDir, "profile-summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    with open(os.path.join(_outputDir, "profile.collapsed"), "w", encoding="utf-8") as f:
+        for path, (count, total, longest, selfTime) in stats:
+            f.write(f"{';'.join(name.replace(' ', '_') for name in path)} {max(int(selfTime * 1000000), 0)}\n")
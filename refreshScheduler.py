@@ -0,0 +1,95 @@
+#! python3
+
+# Updates the AH data in the background, so the window doesn't freeze
+# while the whole auction house downloads.
+
+# Tkinter isn't thread safe, so the download thread never touches it.
+# It just puts messages on a queue, and the Tk main loop checks the queue
+# every so often with after() and passes them on.
+
+import queue, threading # Standard library modules
+
+from auctionData import ingestAH # The stored AH data
+import profiler # Timing for --profile
+
+
+POLL_MS = 100 # How often to check for messages from the download thread
+
+
+class RefreshScheduler():
+    """
+    Runs ingestAH() in a worker thread, right away with refreshNow()
+    and then every <intervalMs> milliseconds (0 means only when asked).
+
+    The callbacks are all called from the Tk main loop:
+        onProgress(pagesDone, totalPages)
+        onDone(auctionCount)
+        onError(exception)
+    """
+    def __init__(self, widget, intervalMs=0, onProgress=None, onDone=None, onError=None):
+        self.widget = widget # Any tk widget, used for after()
+        self.intervalMs = intervalMs
+        self.onProgress = onProgress
+        self.onDone = onDone
+        self.onError = onError
+        self.messages = queue.Queue()
+        self.thread = None
+        self._timer = None
+        self._polling = False
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Starts refreshing every intervalMs, if there is an interval"""
+        self._scheduleNext()
+
+    def stop(self):
+        """Stops the timed refreshes. A download already going will still finish."""
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+
+    def refreshNow(self):
+        """Starts a refresh, unless one is already going. Returns whether it started one."""
+        if self.running: return False
+        self.thread = threading.Thread(target=self._download, name="AH refresh", daemon=True)
+        self.thread.start()
+        if not self._polling:
+            self._polling = True
+            self.widget.after(POLL_MS, self._poll)
+        return True
+
+    def _scheduleNext(self):
+        if self.intervalMs > 0:
+            self._timer = self.widget.after(self.intervalMs, self._timedRefresh)
+
+    def _timedRefresh(self):
+        self._timer = None
+        self.refreshNow()
+        self._scheduleNext()
+
+    def _download(self):
+        """Runs in the worker thread. Don't touch tkinter in here!"""
+        try:
+            with profiler.span("AH download"):
+                count = ingestAH(progress=lambda pagesDone, totalPages: self.messages.put(("progress", pagesDone, totalPages)))
+            # ingestAH swaps the new data in all at once, the next search picks it up by itself
+            self.messages.put(("done", count))
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def _poll(self):
+        """Runs in the Tk main loop, hands the worker's messages to the callbacks"""
+        try:
+            while True:
+                message = self.messages.get_nowait()
+                kind, args = message[0], message[1:]
+                callback = {"progress": self.onProgress, "done": self.onDone, "error": self.onError}[kind]
+                if callback is not None: callback(*args)
+        except queue.Empty: pass
+
+        if self.running or not self.messages.empty():
+            self.widget.after(POLL_MS, self._poll)
+        else: self._polling = False
@@ -0,0 +1,145 @@
+#! python3
+
+# The binary snapshot file, the quick to open version of the AH data.
+# Instead of parsing a giant json file before answering a single price query,
+# the file is memory mapped and the columns are read straight out of it.
+# The OS only loads the parts that actually get used, and if a few copies of
+# the program have it open at once they all share the same memory.
+
+# Layout (everything little endian):
+#   header          magic, format version, number of auctions, number of names
+#   end             int64 per auction
+#   starting_bid    int64 per auction
+#   highest_bid     int64 per auction
+#   name id         uint32 per auction
+#   bin             uint8 per auction (1 = BIN), padded to a multiple of 8 bytes
+#   name offsets    uint64 per name, plus one on the end
+#   names           every different lowercased item name, utf-8, one after the other
+
+import os, sys, mmap, struct # Standard library modules
+from array import array
+
+
+MAGIC = b"SBAHSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQ") # magic, format version, (unused), auctions, names
+
+
+class ColumnBuilder():
+    """Collects the columns for a snapshot file one auction at a time"""
+    def __init__(self):
+        self.end = array("q")
+        self.startingBid = array("q")
+        self.highestBid = array("q")
+        self.nameIds = array("I")
+        self.isBin = array("B")
+        self.names = [] # Every different lowercased name, indexed by name id
+        self.idsByName = {}
+
+    def add(self, auction):
+        """Adds an auction (as it comes from the API) to the end of the columns"""
+        name = auction["item_name"].lower()
+        nameId = self.idsByName.get(name)
+        if nameId is None:
+            nameId = self.idsByName[name] = len(self.names)
+            self.names.append(name)
+        self.end.append(auction["end"])
+        self.startingBid.append(auction["starting_bid"])
+        self.highestBid.append(auction["highest_bid_amount"])
+        self.nameIds.append(nameId)
+        self.isBin.append("bin" in auction) # The bin key is only there for BIN auctions
+
+    def addRows(self, snapshotFile, start, count):
+        """
+        Copies auctions start to start + count from an open SnapshotFile
+        onto the end of the columns, for pages that haven't changed since it was written
+        """
+        stop = start + count
+        for column, oldColumn in ((self.end, snapshotFile.end), (self.startingBid, snapshotFile.startingBid),
+                                  (self.highestBid, snapshotFile.highestBid), (self.isBin, snapshotFile.isBin)):
+            column.frombytes(oldColumn[start:stop].tobytes()) # Snapshot files are always little endian, so are we
+        newIds = {} # Old name id -> name id in here
+        for oldId in dict.fromkeys(snapshotFile.nameIds[start:stop]): # Each name once, in the order they come up
+            name = snapshotFile.names[oldId]
+            nameId = self.idsByName.get(name)
+            if nameId is None:
+                nameId = self.idsByName[name] = len(self.names)
+                self.names.append(name)
+            newIds[oldId] = nameId
+        self.nameIds.extend(newIds[oldId] for oldId in snapshotFile.nameIds[start:stop])
+
+    def __len__(self):
+        return len(self.end)
+
+    def write(self, path):
+        """Writes the snapshot file. The old file is only replaced once the new one is done."""
+        encodedNames = [name.encode("utf-8") for name in self.names]
+        nameOffsets = array("Q", [0])
+        for encodedName in encodedNames:
+            nameOffsets.append(nameOffsets[-1] + len(encodedName))
+
+        tempPath = path + ".tmp"
+        try:
+            with open(tempPath, "wb") as f:
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(self), len(self.names)))
+                for column in (self.end, self.startingBid, self.highestBid, self.nameIds, self.isBin):
+                    _writeColumn(f, column)
+                f.write(bytes(-len(self) * 5 % 8)) # Pad so the name offsets are lined up
+                _writeColumn(f, nameOffsets)
+                for encodedName in encodedNames: f.write(encodedName)
+            os.replace(tempPath, path)
+        finally:
+            if os.path.exists(tempPath): os.remove(tempPath)
+
+
+def _writeColumn(f, column):
+    if sys.byteorder != "little": # The file is always little endian
+        column = array(column.typecode, column)
+        column.byteswap()
+    f.write(column.tobytes())
+
+
+class SnapshotFile():
+    """
+    An open, memory mapped snapshot file. The columns are memoryviews
+    straight into the file, nothing is read until it's used.
+
+    stamp is the (modified time, size) of the file that got opened.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.stamp = (stat.st_mtime_ns, stat.st_size)
+            if stat.st_size < HEADER.size: raise ValueError(f"{path} is not a snapshot file")
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # The map stays open after the file closes
+
+        magic, formatVersion, unused, count, nameCount = HEADER.unpack_from(self.map)
+        if magic != MAGIC or formatVersion != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a snapshot file this version can read")
+        if sys.byteorder != "little": raise ValueError("Snapshot files can only be memory mapped on little endian machines")
+
+        view = memoryview(self.map)
+        offset = HEADER.size
+        def column(itemSize, typecode, length):
+            nonlocal offset
+            data = view[offset:offset + itemSize * length].cast(typecode)
+            offset += itemSize * length
+            return data
+
+        self.end = column(8, "q", count)
+        self.startingBid = column(8, "q", count)
+        self.highestBid = column(8, "q", count)
+        self.nameIds = column(4, "I", count)
+        self.isBin = column(1, "B", count)
+        offset += -count * 5 % 8
+        nameOffsets = column(8, "Q", nameCount + 1)
+        namesStart = offset
+
+        # There are only a few thousand names, so just read them all now
+        self.names = [bytes(view[namesStart + nameOffsets[i]:namesStart + nameOffsets[i + 1]]).decode("utf-8")
+                      for i in range(nameCount)]
+        nameOffsets.release()
+
+    def __len__(self):
+        return len(self.end)
@@ -0,0 +1,160 @@
+#! python3
+
+# The SQLite version of the stored AH data, used instead of the
+# AHData files when config.storageBackend is "sqlite".
+
+# Searches are indexed queries, so a price lookup doesn't need to
+# load anything first. The same database also holds the users' wishlists.
+
+import os, json, threading # Standard library modules
+
+import config # The config file
+
+
+DB_PATH = os.path.join("auctionHouse", "AHData.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE -- lowercased item_name
+);
+CREATE TABLE IF NOT EXISTS auctions (
+    id INTEGER PRIMARY KEY, -- The order the API gave them in, used to break ties
+    name_id INTEGER NOT NULL REFERENCES names(id),
+    bin INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    starting_bid INTEGER NOT NULL,
+    highest_bid INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS auctions_by_end ON auctions (name_id, bin, end);
+CREATE INDEX IF NOT EXISTS auctions_by_price ON auctions (name_id, bin, starting_bid);
+CREATE INDEX IF NOT EXISTS auctions_bin_end ON auctions (bin, end);
+CREATE INDEX IF NOT EXISTS auctions_bin_price ON auctions (bin, starting_bid);
+
+CREATE TABLE IF NOT EXISTS wishlists (
+    username TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    item TEXT NOT NULL, -- The item as json, same as in the userSaves files
+    PRIMARY KEY (username, position)
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY
+);
+"""
+
+_local = threading.local() # sqlite connections can't be shared between threads
+
+
+def connect(path=None):
+    """Returns this thread's connection to the database, making the tables if needed"""
+    if path is None: path = DB_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None: connections = _local.connections = {}
+    if path not in connections:
+        import sqlite3 # Only imported if the database is actually used
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = sqlite3.connect(path)
+        connection.execute("PRAGMA journal_mode=WAL") # Searches can keep going while new data is written
+        connection.executescript(SCHEMA)
+        connections[path] = connection
+    return connections[path]
+
+
+def storeAuctions(pages, path=None):
+    """
+    Replaces the stored auctions with the auctions from pages (an iterable
+    of lists of auctions). It all happens in one transaction, so searches
+    see either all of the old data or all of the new data.
+
+    Returns the number of auctions stored.
+    """
+    connection = connect(path)
+    count = 0
+    with connection: # Commits at the end, or rolls back if the download fails
+        connection.execute("DELETE FROM auctions")
+        connection.execute("DELETE FROM names")
+        idsByName = {}
+        for auctions in pages:
+            rows = []
+            for auction in auctions:
+                name = auction["item_name"].lower()
+                nameId = idsByName.get(name)
+                if nameId is None:
+                    nameId = idsByName[name] = len(idsByName) + 1
+                    connection.execute("INSERT INTO names (id, name) VALUES (?, ?)", (nameId, name))
+                count += 1
+                rows.append((count, nameId, "bin" in auction, # The bin key is only there for BIN auctions
+                             auction["end"], auction["starting_bid"], auction["highest_bid_amount"]))
+            connection.executemany("INSERT INTO auctions VALUES (?, ?, ?, ?, ?, ?)", rows)
+    connection.execute("ANALYZE") # Let sqlite know what the data looks like, so it picks good indexes
+    return count
+
+
+def _average(item, wantBin, orderBy, priceColumn, num, path=None):
+    """Returns the average <priceColumn> of the <num> best matching auctions, ordered by <orderBy>"""
+    rows = connect(path).execute(f"""
+        SELECT {priceColumn} FROM auctions
+        WHERE bin = ? AND name_id IN (SELECT id FROM names WHERE instr(name, ?) > 0)
+        ORDER BY {orderBy}, id LIMIT ?""", (wantBin, item.lower(), num)).fetchall()
+    return sum(row[0] for row in rows) // num # Return the average
+
+
+def ahSearch(item, path=None):
+    """The same as pricing.ahSearch(), but using the database"""
+    return _average(item, False, "end", "highest_bid", config.ahNum, path)
+
+
+def binSearch(item, path=None):
+    """The same as pricing.binSearch(), but using the database"""
+    return _average(item, True, "starting_bid", "starting_bid", config.binNum, path)
+
+
+def loadWishlist(username, path=None):
+    """Returns the item list for username, or None if there is no such user"""
+    connection = connect(path)
+    if connection.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is None:
+        return None
+    rows = connection.execute("SELECT item FROM wishlists WHERE username = ? ORDER BY position", (username,))
+    return [json.loads(row[0]) for row in rows]
+
+
+def saveWishlist(username, itemList, path=None):
+    """Replaces the stored item list for username (making the user if needed)"""
+    connection = connect(path)
+    with connection:
+        connection.execute("INSERT OR IGNORE INTO users (username) VALUES (?)", (username,))
+        connection.execute("DELETE FROM wishlists WHERE username = ?", (username,))
+        connection.executemany("INSERT INTO wishlists (username, position, item) VALUES (?, ?, ?)",
+                               ((username, position, json.dumps(item)) for position, item in enumerate(itemList)))
+
+
+def saveWishlistChanges(username, changes, path=None):
+    """
+    Makes some changes (see userData.py) to username's stored item list,
+    without rewriting the rest of it
+    """
+    connection = connect(path)
+    with connection:
+        for change in changes:
+            if change["op"] == "add":
+                connection.execute("""INSERT INTO wishlists (username, position, item) VALUES
+                    (?, (SELECT COALESCE(MAX(position) + 1, 0) FROM wishlists WHERE username = ?), ?)""",
+                    (username, username, json.dumps(change["item"])))
+            elif change["op"] == "delete":
+                connection.execute("DELETE FROM wishlists WHERE username = ? AND position = ?", (username, change["position"]))
+                # Move everything after it up one. Through negative numbers, so no two rows have the same position on the way
+                connection.execute("UPDATE wishlists SET position = -position + 1 WHERE username = ? AND position > ?",
+                                   (username, change["position"]))
+                connection.execute("UPDATE wishlists SET position = -position WHERE username = ? AND position < 0", (username,))
+            elif change["op"] == "update":
+                row = connection.execute("SELECT item FROM wishlists WHERE username = ? AND position = ?",
+                                         (username, change["position"])).fetchone()
+                item = json.loads(row[0])
+                item.update(change["values"])
+                connection.execute("UPDATE wishlists SET item = ? WHERE username = ? AND position = ?",
+                                   (json.dumps(item), username, change["position"]))
+
+
+def listUsers(path=None):
+    """Returns the names of every user with a stored wishlist"""
+    return [row[0] for row in connect(path).execute("SELECT username FROM users ORDER BY username")]
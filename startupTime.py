@@ -0,0 +1,61 @@
+#! python3
+
+# Measures how long the program takes to start, by timing the imports
+# (python -X importtime) in a fresh python. Everything slow (requests, numpy,
+# tabulate, sqlite) is supposed to be imported the first time it's used,
+# not at startup, so if this goes over the target something slow snuck back in.
+
+# Usage:
+#   python startupTime.py                 # Checks main and organizerCli
+#   python startupTime.py main --top 20   # Shows the 20 slowest imports of main
+
+import os, sys, argparse, subprocess # Standard library modules
+
+import config # The config file
+
+
+def importTimes(module):
+    """
+    Imports module in a fresh python, returns a list of
+    (module name, own time in ms, total time including its imports in ms)
+    for everything it imported, in the order they finished.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0: raise RuntimeError(f"Couldn't import {module}:\n{result.stderr}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line: continue
+        selfTime, totalTime, name = line[len("import time:"):].split("|")
+        if name == " site": # Python's own startup, nothing to do with us
+            times = []
+            continue
+        times.append((name.strip(), int(selfTime) / 1000, int(totalTime) / 1000))
+    return times
+
+
+def report(module, top):
+    """Prints the import times for module, returns whether it's under the target"""
+    times = importTimes(module)
+    total = next(totalTime for name, selfTime, totalTime in reversed(times) if name == module)
+    target = config.startupTargetMs
+    print(f"{module}: {total:.1f}ms to import (target {target}ms) {'OK' if total <= target else 'TOO SLOW'}")
+    for name, selfTime, totalTime in sorted(times, key=lambda t: t[2], reverse=True)[:top]:
+        print(f"    {totalTime:8.1f}ms total {selfTime:8.1f}ms self   {name}")
+    return total <= target
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reports how long the organizer takes to import")
+    parser.add_argument("modules", nargs="*", default=["main", "organizerCli"], help="The modules to time")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to show")
+    args = parser.parse_args(argv)
+
+    allFast = True
+    for module in args.modules:
+        allFast = report(module, args.top) and allFast
+    sys.exit(0 if allFast else 1)
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,129 @@
+#! python3
+
+# Checks that updating the AH data only does the work it has to (see
+# auctionData.storePages()), against a stand-in for the API running on 127.0.0.1.
+
+import os, sys, json, random, filecmp, threading # Standard library modules
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # So the organizer can be imported
+
+import config # The config file
+import ahDownloader, auctionData # The organizer itself
+
+
+NAMES = ["Enchanted Book", "Hyperion", "Pet Skin", "Aspect of the End", "[Lvl 100] Ender Dragon"]
+
+
+def makePages(pageCount=4, perPage=50, lastUpdated=1000, seed=0):
+    """A made up auction house, as the pages the API would send"""
+    rng = random.Random(seed)
+    pages = []
+    for pageNumber in range(pageCount):
+        auctions = []
+        for index in range(perPage):
+            auction = {"uuid": f"{pageNumber:04x}{index:028x}", "item_name": rng.choice(NAMES), "item_lore": "§7Lore",
+                       "end": 10**12 + rng.randint(0, 10**6), "starting_bid": rng.randint(1, 10**6),
+                       "highest_bid_amount": rng.randint(0, 10**6), "claimed": False, "bids": []}
+            if rng.random() < 0.6: auction["bin"] = True
+            auctions.append(auction)
+        pages.append({"success": True, "page": pageNumber, "totalPages": pageCount, "totalAuctions": pageCount * perPage,
+                      "lastUpdated": lastUpdated, "auctions": auctions})
+    return pages
+
+
+class FakeAPI():
+    """Serves self.pages like the auctions endpoint, and remembers which pages were asked for"""
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass # Keep the test output clean
+
+            def do_GET(self):
+                page = int(parse_qs(urlparse(self.path).query).get("page", ["0"])[0])
+                api.requested.append(page)
+                body = json.dumps(api.pages[page]).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/skyblock/auctions"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeAPI(makePages())
+    monkeypatch.setattr(config, "auctionsURL", api.url)
+    monkeypatch.setattr(config, "storageBackend", "file")
+    monkeypatch.setattr(config, "recordPriceHistory", False)
+    monkeypatch.setattr(config, "downloadWorkers", 2)
+    yield api
+    api.close()
+
+
+@pytest.fixture
+def decodedPages(monkeypatch):
+    """The page numbers that actually got decoded"""
+    decoded = []
+    decodePage = ahDownloader.decodePage
+    def countingDecodePage(content, *args, **kwargs):
+        pageData = decodePage(content, *args, **kwargs)
+        decoded.append(pageData.get("page"))
+        return pageData
+    monkeypatch.setattr(ahDownloader, "decodePage", countingDecodePage)
+    return decoded
+
+
+def ingestInto(folder, monkeypatch):
+    os.makedirs(folder, exist_ok=True)
+    monkeypatch.chdir(folder)
+    return auctionData.ingestAH()
+
+
+def test_sameLastUpdatedOnlyFetchesFirstPage(api, decodedPages, tmp_path, monkeypatch):
+    assert ingestInto(tmp_path, monkeypatch) == 200
+    api.requested.clear()
+    assert auctionData.ingestAH() == 200
+    assert api.requested == [0]
+
+
+def test_unchangedPagesAreCopied(api, decodedPages, tmp_path, monkeypatch):
+    ingestInto(tmp_path / "incremental", monkeypatch)
+
+    # A new update where only page 2 changed
+    api.pages = makePages(lastUpdated=2000)
+    api.pages[2]["auctions"][0]["starting_bid"] = 1
+    decodedPages.clear()
+    api.requested.clear()
+    assert auctionData.ingestAH() == 200
+    assert sorted(api.requested) == [0, 1, 2, 3]
+    assert decodedPages == [0, 2] # Page 0 always is, for totalPages and lastUpdated
+
+    incrementalSnapshot = os.path.abspath(auctionData.snapshotPath())
+
+    # Should be the same as downloading everything from scratch
+    ingestInto(tmp_path / "full", monkeypatch)
+    assert filecmp.cmp(tmp_path / "incremental" / auctionData.DATA_PATH, auctionData.DATA_PATH, shallow=False)
+    assert filecmp.cmp(incrementalSnapshot, auctionData.snapshotPath(), shallow=False)
+    assert topKWithoutStamp(tmp_path / "incremental" / auctionData.TOPK_PATH) == topKWithoutStamp(auctionData.TOPK_PATH)
+
+
+def topKWithoutStamp(path):
+    """The top k file, minus which snapshot file it's for (the files' modified times are different)"""
+    with open(path, "r") as f:
+        topK = json.load(f)
+    del topK["snapshot"]
+    return topK
@@ -0,0 +1,119 @@
+#! python3
+
+# The best few auctions of every item name, worked out while the AH data is
+# being stored, so price searches don't have to look through the whole market.
+
+# ahSearch() wants the config.ahNum regular auctions closest to ending, and
+# binSearch() the config.binNum cheapest BINs, out of every auction whose name
+# has the search in it. The best <num> of all those auctions are always somewhere
+# in the best <num> of each name, so keeping the best <num> of every name is
+# enough to answer any search: find the names that match, and merge their lists.
+
+# Stored next to the snapshot file as auctionHouse/AHTopK.json:
+#   {"ahNum": ..., "binNum": ..., "snapshot": [modified time, size] of the snapshot file it's for,
+#    "ah":  [[[end, auction number, highest bid], ...] for each name id],
+#    "bin": [[[starting bid, auction number, starting bid], ...] for each name id]}
+
+import os, json, heapq # Standard library modules
+
+
+class TopKBuilder():
+    """Keeps the best <ahNum> regular auctions and <binNum> BINs of each name id"""
+    def __init__(self, ahNum, binNum):
+        self.ahNum = ahNum
+        self.binNum = binNum
+        # name id -> heap of the best auctions so far. The heaps are "biggest first" (everything
+        # is negative) so the worst one of the best <num> is always on top, ready to get kicked out.
+        self.ahHeaps = {}
+        self.binHeaps = {}
+
+    def addRows(self, columns, start, stop):
+        """Adds auctions start to stop of a snapshotFile.ColumnBuilder"""
+        rows = zip(columns.nameIds[start:stop], columns.isBin[start:stop], columns.end[start:stop],
+                   columns.startingBid[start:stop], columns.highestBid[start:stop])
+        keepBest(self.ahHeaps, self.binHeaps, self.ahNum, self.binNum, rows, start)
+
+    def write(self, path, snapshotPath, nameCount):
+        """
+        Writes the file, for the snapshot file that was just written to snapshotPath.
+        The old file is only replaced once the new one is done.
+        """
+        def bestFirst(heaps):
+            return [sorted((-key, -index, price) for key, index, price in heaps.get(nameId, ())) for nameId in range(nameCount)]
+
+        tempPath = path + ".tmp"
+        try:
+            with open(tempPath, "w") as f:
+                json.dump({"ahNum": self.ahNum, "binNum": self.binNum, "snapshot": _fileStamp(snapshotPath),
+                           "ah": bestFirst(self.ahHeaps), "bin": bestFirst(self.binHeaps)}, f, separators=(",", ":"))
+            os.replace(tempPath, path)
+        finally:
+            if os.path.exists(tempPath): os.remove(tempPath)
+
+
+def keepBest(ahHeaps, binHeaps, ahNum, binNum, rows, start=0, groupsByName=None):
+    """
+    The one pass over the auctions that everything else is built on. Keeps the best <ahNum>
+    regular auctions and <binNum> BINs out of rows for each group, in ahHeaps and binHeaps
+    (dictionaries of group -> heap, as "biggest first" (key, auction number, price) with everything negative).
+
+    rows is (name id, is BIN, end, starting bid, highest bid) for each auction, the first one
+    being auction number <start>. Each auction counts for its name id, or if groupsByName is
+    given, for every group in groupsByName[name id] instead (like the search terms in each name).
+    """
+    for auctionIndex, (nameId, isBin, end, startingBid, highestBid) in enumerate(rows, start):
+        if groupsByName is None: groups = (nameId,)
+        else:
+            groups = groupsByName[nameId]
+            if not groups: continue
+
+        if isBin: # BIN, we want the cheapest
+            heaps, num = binHeaps, binNum
+            entry = (-startingBid, -auctionIndex, startingBid)
+        else: # Regular auction, we want the ones closest to ending
+            heaps, num = ahHeaps, ahNum
+            entry = (-end, -auctionIndex, highestBid)
+
+        for group in groups:
+            heap = heaps.get(group)
+            if heap is None: heap = heaps[group] = []
+            if len(heap) < num: heapq.heappush(heap, entry)
+            elif entry > heap[0]: heapq.heapreplace(heap, entry) # Better than the worst one we have
+
+
+class TopK():
+    """A loaded AHTopK.json"""
+    def __init__(self, data):
+        self.ahNum = data["ahNum"]
+        self.binNum = data["binNum"]
+        self.ah = data["ah"]
+        self.bin = data["bin"]
+
+    def canAnswer(self, wantBin, num):
+        """Whether it kept enough auctions per name to find the best <num>"""
+        return num <= (self.binNum if wantBin else self.ahNum)
+
+    def average(self, nameIds, wantBin, num):
+        """
+        The same as pricing._average(): the average price of the <num>
+        best auctions with one of the name ids, either BIN or not.
+        """
+        bestByName = self.bin if wantBin else self.ah
+        if len(nameIds) == 1: bestAuctions = bestByName[nameIds[0]][:num] # Already in order, nothing to merge
+        else: bestAuctions = heapq.nsmallest(num, (entry for nameId in nameIds for entry in bestByName[nameId]))
+        return sum(entry[2] for entry in bestAuctions) // num # Return the average
+
+
+def _fileStamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def loadTopK(path, snapshotPath):
+    """Returns the TopK for the snapshot file at snapshotPath, or None if there isn't one or it's for some other data"""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("snapshot") != _fileStamp(snapshotPath): return None
+    except (FileNotFoundError, ValueError): return None
+    return TopK(data)
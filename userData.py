@@ -0,0 +1,143 @@
+#! python3
+
+# Loading and saving users' item lists, either from the userSaves
+# folder or from the database, depending on config.storageBackend
+
+# Small changes (adding, deleting or repricing a few items) don't rewrite
+# the whole list, see saveUserChanges(). In the userSaves folder they're
+# added to the end of a journal file next to the user's save, and once the
+# journal gets about as long as the list, it's all written into the save
+# again (compacted). Loading replays the journal on top of the save, so
+# nothing saved is lost if the program crashes.
+
+# Journal layout (userSaves/items<username>.journal, one json per line):
+#   {"base": hash of the save file the changes are on top of}
+#   {"op": "add", "item": {...}}
+#   {"op": "delete", "position": ...}
+#   {"op": "update", "position": ..., "values": {...}}
+
+import os, json, hashlib # Standard library modules
+
+import config # The config file
+import sqliteStore # The SQLite version of the stored data
+
+
+SAVE_DIR = "userSaves"
+
+
+MIN_JOURNAL_LENGTH = 100 # Changes a journal can always have before it's compacted
+
+_journalLengths = {} # username -> changes in their journal, so the file doesn't have to be read to find out
+
+
+def _savePath(username):
+    return os.path.join(SAVE_DIR, f"items{username}.json")
+
+
+def _journalPath(username):
+    return os.path.join(SAVE_DIR, f"items{username}.journal")
+
+
+def _fileHash(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except FileNotFoundError: return None
+
+
+def applyChanges(itemList, changes):
+    """Makes the changes (see the top of this file) to itemList"""
+    for change in changes:
+        if change["op"] == "add": itemList.append(change["item"])
+        elif change["op"] == "delete": del itemList[change["position"]]
+        elif change["op"] == "update": itemList[change["position"]].update(change["values"])
+
+
+def _loadJournal(username):
+    """Returns the changes in username's journal that haven't been compacted into their save yet"""
+    journalPath = _journalPath(username)
+    try:
+        with open(journalPath, "rb") as f:
+            lines = f.readlines()
+    except FileNotFoundError: return []
+
+    changes = []
+    goodBytes = 0 # How much of the file is whole records
+    for number, line in enumerate(lines):
+        try: record = json.loads(line)
+        except ValueError:
+            if number < len(lines) - 1: raise
+            # Only half written when the program stopped. Cut it off, so new changes don't get stuck onto it
+            with open(journalPath, "r+b") as f:
+                f.truncate(goodBytes)
+            break
+        if number == 0 and record.get("base") != _fileHash(_savePath(username)):
+            # The save isn't the one the journal is for, so the journal was already compacted
+            # into it (and the program stopped before deleting the journal)
+            os.remove(journalPath)
+            return []
+        if number > 0: changes.append(record)
+        goodBytes += len(line)
+        if not line.endswith(b"\n"): # A whole record, but the program stopped before its newline
+            with open(journalPath, "ab") as f: # Finish the line, so new changes don't get stuck onto it
+                f.write(b"\n")
+    return changes
+
+
+def loadUserItems(username):
+    """Returns the item list for username, or None if the user doesn't exist yet"""
+    if config.storageBackend == "sqlite": return sqliteStore.loadWishlist(username)
+    try:
+        with open(_savePath(username), "r") as f:
+            itemList = json.load(f)
+    except FileNotFoundError: return None
+    changes = _loadJournal(username)
+    applyChanges(itemList, changes)
+    _journalLengths[username] = len(changes)
+    return itemList
+
+
+def saveUserItems(username, itemList):
+    """Saves the whole item list for username, creating the user if needed"""
+    if config.storageBackend == "sqlite": return sqliteStore.saveWishlist(username, itemList)
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    tempPath = _savePath(username) + ".tmp"
+    with open(tempPath, "w") as f:
+        json.dump(itemList, f)
+    os.replace(tempPath, _savePath(username))
+    # The journal is in the save now. If the program stops before this, the
+    # journal's base won't match the new save, so it gets ignored anyway.
+    if os.path.exists(_journalPath(username)): os.remove(_journalPath(username))
+    _journalLengths[username] = 0
+
+
+def saveUserChanges(username, changes, itemList):
+    """
+    Saves some changes to username's items, which are now itemList.
+    Only the changes get written, unless the journal is long enough
+    that it's time to compact it. username has to be saved already.
+    """
+    if not changes: return
+    if config.storageBackend == "sqlite": return sqliteStore.saveWishlistChanges(username, changes)
+
+    if username not in _journalLengths: loadUserItems(username) # Find out how long the journal is
+    journalLength = _journalLengths[username] + len(changes)
+    if journalLength > max(MIN_JOURNAL_LENGTH, len(itemList)): # Replaying it would be slower than loading the list
+        return saveUserItems(username, itemList)
+
+    journalPath = _journalPath(username)
+    newJournal = not os.path.exists(journalPath) or os.path.getsize(journalPath) == 0
+    with open(journalPath, "a") as f:
+        if newJournal: f.write(json.dumps({"base": _fileHash(_savePath(username))}) + "\n")
+        f.writelines(json.dumps(change) + "\n" for change in changes)
+        f.flush()
+        os.fsync(f.fileno())
+    _journalLengths[username] = journalLength
+
+
+def listUsers():
+    """Returns the names of every user with saved items"""
+    if config.storageBackend == "sqlite": return sqliteStore.listUsers()
+    if not os.path.isdir(SAVE_DIR): return []
+    return sorted(fileName[len("items"):-len(".json")] for fileName in os.listdir(SAVE_DIR)
+                  if fileName.startswith("items") and fileName.endswith(".json"))
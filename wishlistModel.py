@@ -0,0 +1,105 @@
+#! python3
+
+# A user's wishlist, kept sorted by every column you can sort by.
+
+# Instead of sorting the whole list every time the table is drawn, each sort
+# key has its own sorted index, and adding, deleting or repricing an item
+# just moves that item around in the indexes (a binary search, not a sort).
+# Switching the sort column is then free too.
+
+import bisect, contextlib # Standard library modules
+
+
+SORT_KEYS = ["Name", "Priority", "UserCost", "AHCost", "BINCost"] # The update times can be -1 or text, so can't be sorted
+
+
+class WishlistModel():
+    """
+    Holds the items (dicts like the ones in the userSaves files).
+    Change them through add(), remove() and update(), not directly,
+    or the sorted indexes won't know about it.
+
+    onChange, if set, is called after every change.
+
+    If store (a WishlistStore) is given, the changes are made while holding its
+    lock, and it's told about each one (as a change for userData.saveUserChanges())
+    so username's wishlist gets autosaved.
+    """
+    def __init__(self, items=None, store=None, username=None):
+        # In the order they were added, which is the order they're saved in. It's the same
+        # list that was passed in (not a copy), so the store sees the changes too.
+        self.items = [] if items is None else items
+        self.onChange = None
+        self.store = store
+        self.username = username
+        self._lock = store.lock if store is not None else contextlib.nullcontext()
+        self._nextSerial = 0 # Each item gets a number, so equal values stay in the order they were added
+        self._serials = {} # id(item) -> serial
+        self._positions = {} # id(item) -> where it is in self.items
+        self._itemsBySerial = {}
+        self._indexes = {key: [] for key in SORT_KEYS} # key -> sorted list of (value, serial)
+
+        for position, item in enumerate(self.items):
+            self._track(item)
+            self._positions[id(item)] = position
+        for key, index in self._indexes.items(): # Sort once at the start instead of inserting one at a time
+            index.extend((item[key], self._serials[id(item)]) for item in self.items)
+            index.sort()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def _track(self, item):
+        serial = self._nextSerial
+        self._nextSerial += 1
+        self._serials[id(item)] = serial
+        self._itemsBySerial[serial] = item
+        return serial
+
+    def _changed(self, change):
+        if self.store is not None: self.store.changed(self.username, change)
+        if self.onChange is not None: self.onChange()
+
+    def sortedItem(self, key, position, reverse=False):
+        """Returns the item at <position> when the list is sorted by key"""
+        index = self._indexes[key]
+        if reverse: position = len(index) - 1 - position
+        return self._itemsBySerial[index[position][1]]
+
+    def add(self, item):
+        with self._lock:
+            serial = self._track(item)
+            self._positions[id(item)] = len(self.items)
+            self.items.append(item)
+            for key, index in self._indexes.items():
+                bisect.insort(index, (item[key], serial))
+            self._changed({"op": "add", "item": item})
+
+    def remove(self, item):
+        with self._lock:
+            serial = self._serials.pop(id(item))
+            del self._itemsBySerial[serial]
+            position = self._positions.pop(id(item))
+            del self.items[position]
+            for laterPosition in range(position, len(self.items)): # Everything after it moved up one
+                self._positions[id(self.items[laterPosition])] = laterPosition
+            for key, index in self._indexes.items():
+                del index[bisect.bisect_left(index, (item[key], serial))]
+            self._changed({"op": "delete", "position": position})
+
+    def update(self, item, **values):
+        """
+        Changes some of item's values, eg. update(item, AHCost=100, AHUpdateTime=time.asctime())
+        """
+        with self._lock:
+            serial = self._serials[id(item)]
+            for key, value in values.items():
+                index = self._indexes.get(key)
+                if index is not None and item[key] != value: # Move it to its new place in this index
+                    del index[bisect.bisect_left(index, (item[key], serial))]
+                    bisect.insort(index, (value, serial))
+                item[key] = value
+            self._changed({"op": "update", "position": self._positions[id(item)], "values": values})
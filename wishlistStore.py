@@ -0,0 +1,125 @@
+#! python3
+
+# Every user's wishlist in one place, saved automatically.
+
+# Wishlists are loaded the first time they're asked for and kept in memory.
+# When one changes it isn't written straight away: one background thread waits
+# until it hasn't changed for config.autosaveSeconds, so a burst of changes (like
+# repricing everything) is one write. Each change just moves the time to save
+# at further back. close() writes anything still waiting, so nothing is lost
+# when the program closes.
+
+# The writing happens without holding lock, so changing a wishlist (in the GUI)
+# never has to wait for the disk.
+
+# Only the changes get written, not the whole list (see userData.saveUserChanges()),
+# and if nothing changed, nothing is written.
+
+# Users only get saved once something is actually in their wishlist (or they
+# click save), so a mistyped username doesn't leave an empty save behind.
+
+import time, threading, traceback # Standard library modules
+
+import config # The config file
+from userData import loadUserItems, saveUserItems, saveUserChanges, listUsers # Loading and saving item lists
+
+
+class WishlistStore():
+    """
+    Change wishlists while holding lock, and call changed(username, change)
+    for each change, so the autosave never writes a list halfway through a change.
+    """
+    def __init__(self, delay=None):
+        self.delay = config.autosaveSeconds if delay is None else delay
+        self.lock = threading.RLock()
+        self._wishlists = {} # username -> item list, for every user loaded so far
+        self._unsaved = {} # username -> changes since they were last written
+        self._new = set() # Users that have never been saved
+        self._saveAt = None # time.monotonic() to autosave at, None if there's nothing to save
+        self._wake = threading.Condition(self.lock) # Tells the autosave thread _saveAt changed
+        self._autosaveThread = None # Started the first time something changes
+        self._closed = False
+        self._writeLock = threading.Lock() # One save at a time, so they hit the disk in order
+
+    def load(self, username):
+        """Returns username's item list, or None if there's no such user"""
+        with self.lock:
+            if username not in self._wishlists:
+                itemList = loadUserItems(username)
+                if itemList is None: return None
+                self._wishlists[username] = itemList
+            return self._wishlists[username]
+
+    def create(self, username):
+        """Makes a new, empty, user. It isn't saved until it changes."""
+        with self.lock:
+            if username not in self._wishlists:
+                self._wishlists[username] = []
+                self._new.add(username)
+            return self._wishlists[username]
+
+    def users(self):
+        """Returns every user, saved or not"""
+        with self.lock:
+            return sorted(set(listUsers()) | set(self._wishlists))
+
+    def changed(self, username, change):
+        """
+        Call after each change to username's wishlist (see userData.py for what
+        the changes look like). It'll be saved once the changes stop for a bit.
+        """
+        with self.lock:
+            self._unsaved.setdefault(username, []).append(change)
+            if self._saveAt is None: self._wake.notify() # The thread is waiting for something to save
+            self._saveAt = time.monotonic() + self.delay # Start waiting again
+            if self._autosaveThread is None:
+                self._autosaveThread = threading.Thread(target=self._autosave, name="autosave", daemon=True)
+                self._autosaveThread.start()
+
+    def _autosave(self):
+        """The autosave thread: waits until nothing has changed for self.delay, then saves"""
+        while True:
+            with self.lock:
+                while not self._closed and (self._saveAt is None or self._saveAt > time.monotonic()):
+                    self._wake.wait(None if self._saveAt is None else self._saveAt - time.monotonic())
+                if self._closed: return
+            try: self.flush()
+            except Exception: traceback.print_exc() # Keep going, it's tried again after the next change
+
+    def save(self, username):
+        """Saves right now. A new user is saved even if they have no items yet."""
+        with self.lock:
+            if username in self._new: self._unsaved.setdefault(username, [])
+        self.flush()
+
+    def flush(self):
+        """Writes every unsaved wishlist"""
+        with self._writeLock:
+            with self.lock: # Only long enough to take the changes and copy what's needed to write them
+                self._saveAt = None
+                unsaved, self._unsaved = self._unsaved, {}
+                saves = []
+                for username, changes in sorted(unsaved.items()):
+                    itemList = [dict(item) for item in self._wishlists[username]]
+                    if username in self._new: changes = None # Nothing to add the changes to yet, so save everything
+                    else: changes = [dict(change, item=dict(change["item"])) if "item" in change else change for change in changes]
+                    saves.append((username, changes, itemList))
+                    self._new.discard(username)
+
+            for done, (username, changes, itemList) in enumerate(saves):
+                try:
+                    if changes is None: saveUserItems(username, itemList)
+                    else: saveUserChanges(username, changes, itemList)
+                except BaseException:
+                    with self.lock: # Put back what didn't get written, so the next save tries again
+                        for username, changes, itemList in saves[done:]:
+                            if changes is None: self._new.add(username)
+                            self._unsaved[username] = (changes or []) + self._unsaved.get(username, [])
+                    raise
+
+    def close(self):
+        """Writes anything that's waiting to be written. Call this before the program exits."""
+        with self.lock:
+            self._closed = True
+            self._wake.notify()
+        self.flush()
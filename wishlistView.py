@@ -0,0 +1,135 @@
+#! python3
+
+# The table of wishlist items in the main window.
+
+# A ttk.Treeview with one row per item gets slow with thousands of items,
+# and a Text widget full of tabulate output is even worse (the whole thing is
+# redrawn every time anything changes). So the table only ever has as many
+# rows as fit on screen, and scrolling just changes which items those rows show.
+# Redrawing only touches rows whose text actually changed.
+
+# The items come from a WishlistModel (see wishlistModel.py), which keeps them
+# sorted already. Lots of changes in a row (like repricing everything) only
+# cause one redraw, once tkinter has nothing else to do.
+
+import tkinter as tk
+from tkinter import ttk
+
+import profiler # Timing for --profile
+from wishlistModel import SORT_KEYS # The columns that can be sorted by
+
+
+# (item key, column heading, width in pixels)
+COLUMNS = [
+    ("Name", "Name", 220),
+    ("Priority", "Priority", 60),
+    ("UserCost", "Your Price", 90),
+    ("AHCost", "AH Price", 90),
+    ("AHUpdateTime", "AH Updated", 160),
+    ("BINCost", "BIN Price", 90),
+    ("BINUpdateTime", "BIN Updated", 160),
+]
+
+
+class WishlistView(tk.Frame):
+    """
+    Shows the items in a WishlistModel.
+    Click a column heading to sort by it, click it again to reverse the order.
+    """
+    def __init__(self, master, rows=15):
+        super().__init__(master)
+        self.rows = rows # How many rows are on screen
+        self.model = None
+        self.sortKey = "Name"
+        self.reverse = False
+        self.offset = 0 # Where the top row is in the sorted list
+        self.shown = [None] * rows # What each row is showing right now, so unchanged rows can be skipped
+        self._redrawPending = False
+        self.initWidgets()
+
+    def initWidgets(self):
+        self.tree = ttk.Treeview(self, columns=[key for key, heading, width in COLUMNS], show="headings",
+                                 height=self.rows, selectmode="browse")
+        for key, heading, width in COLUMNS:
+            command = (lambda key=key: self.sortBy(key)) if key in SORT_KEYS else ""
+            self.tree.heading(key, text=heading, command=command)
+            self.tree.column(key, width=width, anchor="w" if key == "Name" else "e", stretch=key == "Name")
+        self.rowIds = [self.tree.insert("", "end", values=()) for row in range(self.rows)] # Made once, then reused
+
+        self.verticalBar = ttk.Scrollbar(self, orient="vertical", command=self.scroll)
+        self.horizontalBar = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=self.horizontalBar.set)
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.verticalBar.grid(row=0, column=1, sticky="ns")
+        self.horizontalBar.grid(row=1, column=0, sticky="ew")
+
+        # The tree only has a screenful of rows, so scroll through the items instead of the tree
+        self.tree.bind("<MouseWheel>", lambda event: self.scrollWheel(-1 if event.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda event: self.scrollWheel(-1)) # Linux
+        self.tree.bind("<Button-5>", lambda event: self.scrollWheel(1))
+        self.showSortKey()
+
+    def setModel(self, model):
+        """Shows the items in model, and keeps showing them as they change"""
+        if self.model is not None: self.model.onChange = None
+        self.model = model
+        model.onChange = self.refresh
+        self.refresh()
+
+    def refresh(self):
+        """Redraws soon. However many times this is called before then, it only redraws once."""
+        if not self._redrawPending:
+            self._redrawPending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        self._redrawPending = False
+        self.scrollTo(self.offset) # The list might be shorter now
+
+    def sortBy(self, key):
+        """Called when a column heading is clicked"""
+        if key == self.sortKey: self.reverse = not self.reverse
+        else: self.sortKey, self.reverse = key, False
+        self.showSortKey()
+        self.refresh() # The model is already sorted by every key, so this is just a redraw
+
+    def showSortKey(self):
+        """Puts an arrow on the heading of the column the list is sorted by"""
+        for key, heading, width in COLUMNS:
+            arrow = (" ▼" if self.reverse else " ▲") if key == self.sortKey else ""
+            self.tree.heading(key, text=heading + arrow)
+
+    def scroll(self, action, amount, unit=None):
+        """The scrollbar's command"""
+        if action == "moveto": self.scrollTo(int(float(amount) * self.itemCount()))
+        elif unit == "pages": self.scrollTo(self.offset + int(amount) * self.rows)
+        else: self.scrollTo(self.offset + int(amount))
+
+    def scrollWheel(self, direction):
+        self.scrollTo(self.offset + direction * 3)
+        return "break" # Don't let the tree try to scroll itself as well
+
+    def itemCount(self):
+        return 0 if self.model is None else len(self.model)
+
+    def scrollTo(self, offset):
+        self.offset = max(0, min(offset, self.itemCount() - self.rows))
+        self.render()
+
+    def render(self):
+        """Puts the items that are scrolled to into the rows, skipping rows that haven't changed"""
+        with profiler.span("draw rows"):
+            total = self.itemCount()
+            for row, rowId in enumerate(self.rowIds):
+                index = self.offset + row
+                if index < total:
+                    item = self.model.sortedItem(self.sortKey, index, self.reverse)
+                    values = tuple(item[key] for key, heading, width in COLUMNS)
+                else: values = ()
+                if values != self.shown[row]:
+                    self.tree.item(rowId, values=values)
+                    self.shown[row] = values
+
+            if total > self.rows: self.verticalBar.set(self.offset / total, (self.offset + self.rows) / total)
+            else: self.verticalBar.set(0, 1)